@@ -0,0 +1,396 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from itertools import repeat
+
+from reportlab import rl_config
+from reportlab.platypus import Table, TableStyle, SimpleDocTemplate, Paragraph, Spacer, PageBreak
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.utils import ImageReader
+from PIL import Image
+
+# À incrémenter à chaque modification de la mise en page des bulletins
+TEMPLATE_VERSION = 2
+
+NOM_FORM_ENTETE = "entete_inata"
+
+# Flux binaires : l'encodage ASCII85 (en Python pur) des logos dominait le
+# temps de rendu et gonflait chaque PDF d'un quart.
+rl_config.useA85 = 0
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+# Taille des morceaux envoyés au client lors du streaming
+TAILLE_MORCEAU = 64 * 1024
+
+
+def annee_universitaire():
+    return f"{datetime.now().year} - {datetime.now().year + 1}"
+
+
+# ---------------- Chargement des données ----------------
+def payloads_etudiants(etudiants, semestre=2):
+    """
+    Construit les données (dictionnaires simples, sans objet ORM) des bulletins
+    d'une liste d'étudiants, avec toutes leurs notes d'examen du semestre
+    chargées en une seule requête.
+    """
+    from .models import Note
+
+    etudiants = list(etudiants)
+    unites_par_etudiant = {etu.id: {} for etu in etudiants}
+
+    notes = Note.objects.filter(
+        etudiant_id__in=unites_par_etudiant.keys(),
+        evaluation__type='examen',
+        evaluation__semestre=semestre
+    ).order_by(
+        'evaluation__matiere__unite__nom', 'evaluation__matiere__nom'
+    ).values_list(
+        'etudiant_id', 'evaluation__matiere__unite__nom', 'evaluation__matiere__nom', 'valeur'
+    )
+
+    for etudiant_id, unite_nom, matiere_nom, valeur in notes:
+        unites_par_etudiant[etudiant_id].setdefault(unite_nom or '-', []).append((matiere_nom, valeur))
+
+    annee = annee_universitaire()
+    return [
+        {
+            "etudiant_id": etu.id,
+            "nom": etu.nom,
+            "prenom": etu.prenom,
+            "classe": etu.classe.niveau if etu.classe else None,
+            "annee_universitaire": annee,
+            "semestre": semestre,
+            "unites": list(unites_par_etudiant[etu.id].items()),
+        }
+        for etu in etudiants
+    ]
+
+
+def nom_fichier(payload):
+    return f"bulletin_s{payload['semestre']}_{payload['nom']}_{payload['prenom']}.pdf"
+
+
+# ---------------- Rendu PDF ----------------
+def _styles():
+    styles = getSampleStyleSheet()
+    nom_centre_style = ParagraphStyle(
+        'NomCentre', parent=styles['Normal'],
+        fontName='Times-Roman',
+        fontSize=12, spaceAfter=20,
+        alignment=1, textColor=colors.black
+    )
+    info_style = ParagraphStyle(
+        'Info', parent=styles['Normal'],
+        fontName='Times-Roman',
+        fontSize=11, spaceAfter=6
+    )
+    return styles, nom_centre_style, info_style
+
+
+def _elements_bulletin(payload):
+    styles, nom_centre_style, info_style = _styles()
+    elements = []
+
+    elements.append(Paragraph("<b>RELEVE DE NOTES</b>", nom_centre_style))
+    elements.append(Spacer(1, 10))
+
+    elements.append(Paragraph(f"<b>De : {payload['nom']} {payload['prenom']}</b>", nom_centre_style))
+    elements.append(Spacer(1, 5))
+    elements.append(Paragraph("<b>Filière :</b> Informatique", info_style))
+    elements.append(Paragraph(f"<b>Niveau :</b> {payload['classe'] or 'Non assigné'}", info_style))
+    elements.append(Paragraph("<b>Spécialité :</b> Web Master / Infographiste", info_style))
+    elements.append(Paragraph(f"<b>Année universitaire :</b> {payload['annee_universitaire']}", info_style))
+    elements.append(Spacer(1, 30))
+
+    if payload['unites']:
+        table_data = [['Unité d\'enseignement', 'Modules', 'Note Examen finale /20']]
+        span_indices = []
+
+        current_row = 1
+        for unite_nom, modules in payload['unites']:
+            for i, (matiere_nom, note_valeur) in enumerate(modules):
+                if i == 0:
+                    table_data.append([unite_nom, matiere_nom, f"{note_valeur:.2f}"])
+                else:
+                    table_data.append(['', matiere_nom, f"{note_valeur:.2f}"])
+            if len(modules) > 1:
+                span_indices.append((current_row, current_row + len(modules) - 1))
+            current_row += len(modules)
+
+        table = Table(table_data, colWidths=[2*inch, 3*inch, 2*inch])
+        style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Times-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('FONTNAME', (0, 1), (-1, -1), 'Times-Roman'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        for start, end in span_indices:
+            style.add('SPAN', (0, start), (0, end))
+        table.setStyle(style)
+        elements.append(table)
+    else:
+        elements.append(Paragraph(
+            f"Aucune note d'examen disponible pour le semestre {payload['semestre']}", styles['Normal']
+        ))
+
+    elements.append(Spacer(1, 40))
+    elements.append(Paragraph("Le Directeur", nom_centre_style))
+    elements.append(Spacer(1, 50))
+    elements.append(Paragraph("RANDRIAMAHARO Mamy", nom_centre_style))
+    return elements
+
+
+# Résolution maximale des logos une fois posés sur la page
+DPI_LOGOS = 300
+
+
+@lru_cache(maxsize=None)
+def _logos_entete():
+    """
+    Décode et redimensionne les logos une seule fois par processus.
+    Retourne une liste de (image, x, y, largeur, hauteur, mask).
+    """
+    logo_gauche = os.path.join(ASSETS_DIR, "InataLogo.png")
+    logos_droite = [
+        os.path.join(ASSETS_DIR, "cisco.png"),
+        os.path.join(ASSETS_DIR, "pearson.png"),
+        os.path.join(ASSETS_DIR, "oracle.png")
+    ]
+    placements = []
+
+    logo_gauche_width, logo_gauche_height = 104, 104
+    y_logo_gauche = 680
+    placements.append((logo_gauche, 40, y_logo_gauche, logo_gauche_width, logo_gauche_height, None))
+
+    logo_droite_width, logo_droite_height = 60, 40
+    spacing = 5
+    total_height_droite = len(logos_droite) * logo_droite_height + (len(logos_droite)-1)*spacing
+    top_padding = -20
+    y_start_droite = y_logo_gauche + logo_gauche_height/2 + total_height_droite/2 + top_padding
+    for i, logo in enumerate(logos_droite):
+        placements.append((logo, 470, y_start_droite - (i+1)*logo_droite_height - i*spacing, logo_droite_width, logo_droite_height, 'auto'))
+
+    logos = []
+    for chemin, x, y, largeur, hauteur, mask in placements:
+        if not os.path.exists(chemin):
+            continue
+        image = Image.open(chemin)
+        image.load()
+        taille_max = (round(largeur / 72 * DPI_LOGOS), round(hauteur / 72 * DPI_LOGOS))
+        if image.width > taille_max[0] or image.height > taille_max[1]:
+            image = image.resize(taille_max, Image.LANCZOS)
+        logos.append((ImageReader(image), x, y, largeur, hauteur, mask))
+    return logos
+
+
+def _dessiner_entete(canvas):
+    for image, x, y, largeur, hauteur, mask in _logos_entete():
+        canvas.drawImage(image, x, y, width=largeur, height=hauteur, mask=mask)
+
+    canvas.setFont('Helvetica-Bold', 14)
+    canvas.drawCentredString(300, 740, "Institut de Arts et des Technologies Avancées")
+
+    canvas.setFont('Helvetica-Bold', 10)
+    canvas.drawCentredString(300, 720, "Etablissement d'Enseignement Superieur Privé")
+
+    canvas.setFont('Helvetica', 6)
+    canvas.drawCentredString(300, 710, "545/MENRS/SG/DGENRS du 17/09/04 35.052/2014-MESuprES du 24/11/14 - 10769/2015- MESuprES du 06/02/15")
+
+    canvas.setFont('Helvetica-Bold', 8)
+    canvas.drawCentredString(300, 700, "Informatique, Arts et Multimédia")
+
+    canvas.setFont('Helvetica-Bold', 8)
+    canvas.drawCentredString(300, 690, "Formation Diplomante et Professionnalisante")
+
+    canvas.setStrokeColor(colors.black)
+    canvas.setLineWidth(1)
+    canvas.line(40, 630, 555, 630)
+    canvas.setStrokeColor(colors.black)
+    canvas.setLineWidth(1)
+    canvas.line(40, 628, 555, 628)
+
+    footer_y = 130
+    canvas.setStrokeColor(colors.black)
+    canvas.setLineWidth(1)
+    canvas.line(40, footer_y, 555, footer_y)
+
+    canvas.setFont('Helvetica-Bold', 10)
+    canvas.drawCentredString(300, footer_y - 18, "Institut de Arts et des Technologies Avancées (InATA)")
+    canvas.setFont('Helvetica', 8)
+    canvas.drawCentredString(300, footer_y - 30, "Face Fokontany II L Ankadivato - 101 Antananarivo - Madagascar")
+    canvas.setFont('Helvetica', 8)
+    canvas.drawCentredString(300, footer_y - 42, "Tel : +261 20 24 244 34 / +261 32 07 260 00 / +261 33 07 260 00 / +261 34 07 260 00 - Email : inata@inata.org")
+
+
+def header_footer(canvas, doc):
+    """
+    En-tête et pied de page fixes : dessinés une seule fois par document dans
+    un form XObject, puis simplement réutilisés sur chaque page.
+    """
+    canvas.saveState()
+    if not canvas.hasForm(NOM_FORM_ENTETE):
+        canvas.beginForm(NOM_FORM_ENTETE)
+        _dessiner_entete(canvas)
+        canvas.endForm()
+    canvas.doForm(NOM_FORM_ENTETE)
+    canvas.restoreState()
+
+
+def _document(destination):
+    return SimpleDocTemplate(
+        destination, pagesize=letter,
+        rightMargin=40, leftMargin=40,
+        topMargin=190, bottomMargin=60
+    )
+
+
+def construire_bulletin(payload):
+    """Rend le bulletin d'un étudiant et retourne les octets du PDF."""
+    buffer = io.BytesIO()
+    _document(buffer).build(_elements_bulletin(payload), onFirstPage=header_footer, onLaterPages=header_footer)
+    return buffer.getvalue()
+
+
+# ---------------- Rendu multi-processus ----------------
+def _rendre_lot(fonction, lot):
+    return [fonction(payload) for payload in lot]
+
+
+def rendre_en_parallele(payloads, fonction=construire_bulletin, workers=None, taille_lot=None):
+    """
+    Rend les payloads dans un pool de processus et produit les PDF dans
+    l'ordre des payloads. Les workers ne reçoivent que des données simples.
+    Le débit est affiché par les commandes (generer_bulletins, fiches_paie).
+    """
+    from django.conf import settings
+
+    payloads = list(payloads)
+    workers = workers or getattr(settings, 'BULLETINS_WORKERS', 1)
+    taille_lot = taille_lot or getattr(settings, 'BULLETINS_TAILLE_LOT', 20)
+
+    if workers <= 1 or len(payloads) <= taille_lot:
+        for payload in payloads:
+            yield fonction(payload)
+    else:
+        lots = [payloads[i:i + taille_lot] for i in range(0, len(payloads), taille_lot)]
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(lots)))
+        try:
+            for resultats in pool.map(_rendre_lot, repeat(fonction), lots):
+                yield from resultats
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ---------------- Cache des PDF ----------------
+def empreinte(payload):
+    """Hash des données d'entrée du bulletin : notes, classe, année, version du modèle."""
+    contenu = json.dumps([TEMPLATE_VERSION, payload], sort_keys=True, default=str)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+def _cache():
+    from django.core.cache import caches
+    return caches['bulletins']
+
+
+def bulletins_avec_cache(payloads):
+    """
+    Produit (empreinte, pdf) pour chaque payload, dans l'ordre. Les bulletins
+    déjà en cache sont réutilisés, les autres sont rendus en parallèle puis
+    mis en cache.
+    """
+    cache = _cache()
+    payloads = list(payloads)
+    cles = [empreinte(payload) for payload in payloads]
+    en_cache = cache.get_many([f"bulletin:{cle}" for cle in cles])
+
+    manquants = [payload for payload, cle in zip(payloads, cles) if f"bulletin:{cle}" not in en_cache]
+    rendus = rendre_en_parallele(manquants)
+
+    for payload, cle in zip(payloads, cles):
+        pdf = en_cache.get(f"bulletin:{cle}")
+        if pdf is None:
+            pdf = next(rendus)
+            cache.set(f"bulletin:{cle}", pdf, timeout=None)
+            cache.set(f"bulletin:etudiant:{payload['etudiant_id']}", cle, timeout=None)
+        yield cle, pdf
+
+
+def invalider_bulletins(etudiants_ids):
+    """Supprime du cache le dernier bulletin rendu pour ces étudiants."""
+    cache = _cache()
+    pointeurs = cache.get_many([f"bulletin:etudiant:{etudiant_id}" for etudiant_id in etudiants_ids])
+    if pointeurs:
+        cache.delete_many([f"bulletin:{cle}" for cle in pointeurs.values()] + list(pointeurs.keys()))
+
+
+# ---------------- Streaming ----------------
+class _FluxSortie:
+    """Fichier en écriture seule, vidé au fil de l'eau par le générateur."""
+
+    def __init__(self):
+        self.morceaux = []
+
+    def write(self, data):
+        self.morceaux.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        data = b"".join(self.morceaux)
+        self.morceaux.clear()
+        return data
+
+
+def flux_zip(fichiers):
+    """
+    Génère une archive ZIP morceau par morceau à partir d'un itérable de
+    (nom, octets). Seul le fichier en cours est gardé en mémoire.
+    """
+    sortie = _FluxSortie()
+    with zipfile.ZipFile(sortie, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for nom, contenu in fichiers:
+            archive.writestr(nom, contenu)
+            yield sortie.vider()
+    yield sortie.vider()
+
+
+def flux_pdf_fusionne(payloads):
+    """
+    Rend tous les bulletins dans un seul PDF (un saut de page par étudiant).
+    Le document est écrit dans un fichier temporaire puis lu par morceaux.
+    Limite : ReportLab garde toutes les pages jusqu'à la fin du rendu, la mémoire
+    croît donc avec la classe et le premier octet n'arrive qu'une fois tout rendu.
+    Le mode ZIP (un PDF par étudiant, en cache, streamé) reste à mémoire constante.
+    """
+    elements = []
+    for payload in payloads:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(_elements_bulletin(payload))
+
+    with tempfile.TemporaryFile() as fichier:
+        _document(fichier).build(elements, onFirstPage=header_footer, onLaterPages=header_footer)
+        fichier.seek(0)
+        while True:
+            morceau = fichier.read(TAILLE_MORCEAU)
+            if not morceau:
+                break
+            yield morceau
@@ -0,0 +1,37 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Lignes lues par lot (iterator(chunk_size=...)) pendant un export
+TAILLE_LOT_EXPORT = 2000
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer écrit une ligne, on la renvoie telle quelle."""
+    def write(self, value):
+        return value
+
+
+def flux_csv(entetes, lignes):
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(entetes)
+    for ligne in lignes:
+        yield writer.writerow(ligne)
+
+
+def flux_ndjson(entetes, lignes):
+    for ligne in lignes:
+        yield json.dumps(dict(zip(entetes, ligne)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def reponse_export(export, nom, entetes, lignes):
+    """StreamingHttpResponse CSV ou NDJSON à partir d'un itérable de tuples."""
+    if export == "csv":
+        response = StreamingHttpResponse(flux_csv(entetes, lignes), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{nom}.csv"'
+    else:
+        response = StreamingHttpResponse(flux_ndjson(entetes, lignes), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{nom}.ndjson"'
+    return response
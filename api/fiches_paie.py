@@ -0,0 +1,144 @@
+import io
+
+from reportlab.platypus import Table, TableStyle, Paragraph, Spacer
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+
+from .bulletins import _styles, _document, header_footer, rendre_en_parallele, flux_zip
+
+
+# ---------------- Chargement des données ----------------
+def payloads_fiches(annee_scolaire, mois, professeur_id=None):
+    """
+    Données (dictionnaires simples) des fiches de paie d'un mois : une fiche par
+    professeur, avec ses salaires par matière et le montant déjà réglé
+    (mois réglés par PaiementProf pour cette année scolaire) lus en une seule requête.
+    """
+    from django.db.models import OuterRef, Subquery, Sum
+    from .models import SalaireMensuel, FraisMensuelProf
+    from .paie import periode
+
+    annee, _ = periode(mois, annee_scolaire)
+
+    regle = (
+        FraisMensuelProf.objects.filter(
+            paiement__professeur=OuterRef('professeur_id'), mois=mois, annee_scolaire=annee_scolaire
+        )
+        .values('paiement__professeur')
+        .annotate(total=Sum('salaire'))
+        .values('total')
+    )
+    salaires = SalaireMensuel.objects.filter(annee_scolaire=annee_scolaire, mois=mois)
+    if professeur_id:
+        salaires = salaires.filter(professeur_id=professeur_id)
+    salaires = salaires.annotate(regle=Subquery(regle)).order_by(
+        'professeur__nom', 'professeur__prenom', 'professeur_id', 'matiere__nom'
+    ).values_list(
+        'professeur_id', 'professeur__nom', 'professeur__prenom', 'professeur__email',
+        'matiere__nom', 'matiere__classe__niveau', 'heures', 'heures_absence', 'montant',
+        'est_paye', 'regle'
+    )
+
+    fiches = []
+    for prof_id, nom, prenom, email, matiere, classe, heures, absence, montant, est_paye, montant_regle in salaires:
+        if not fiches or fiches[-1]["professeur_id"] != prof_id:
+            fiches.append({
+                "professeur_id": prof_id,
+                "nom": nom,
+                "prenom": prenom,
+                "email": email,
+                "mois": mois,
+                "annee": annee,
+                "annee_scolaire": annee_scolaire,
+                "lignes": [],
+                "total": 0,
+                "regle": montant_regle or 0,
+                "est_paye": True,
+            })
+        fiche = fiches[-1]
+        fiche["lignes"].append((matiere, classe or '-', heures, absence, montant))
+        fiche["total"] += montant
+        fiche["est_paye"] = fiche["est_paye"] and est_paye
+    return fiches
+
+
+def nom_fichier(payload):
+    return f"{payload['professeur_id']}_fiche_paie_{payload['mois']}_{payload['annee']}_{payload['nom']}_{payload['prenom']}.pdf"
+
+
+# ---------------- Rendu PDF ----------------
+def _ariary(montant):
+    return f"{montant:,.2f} Ar".replace(",", " ")
+
+
+def _elements_fiche(payload):
+    styles, nom_centre_style, info_style = _styles()
+    elements = []
+
+    elements.append(Paragraph("<b>FICHE DE PAIE</b>", nom_centre_style))
+    elements.append(Spacer(1, 10))
+
+    elements.append(Paragraph(f"<b>De : {payload['nom']} {payload['prenom']}</b>", nom_centre_style))
+    elements.append(Spacer(1, 5))
+    elements.append(Paragraph(f"<b>Email :</b> {payload['email']}", info_style))
+    elements.append(Paragraph(f"<b>Période :</b> {payload['mois']} {payload['annee']}", info_style))
+    elements.append(Paragraph(f"<b>Année scolaire :</b> {payload['annee_scolaire']}", info_style))
+    elements.append(Spacer(1, 20))
+
+    table_data = [['Module', 'Classe', 'Heures', 'Absences', 'Montant']]
+    for matiere, classe, heures, absence, montant in payload['lignes']:
+        table_data.append([matiere, classe, str(heures), str(absence), _ariary(montant)])
+    table_data.append(['Total', '', '', '', _ariary(payload['total'])])
+
+    table = Table(table_data, colWidths=[2.2*inch, 1*inch, 0.8*inch, 0.9*inch, 1.6*inch])
+    table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('ALIGN', (-1, 1), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Times-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('FONTNAME', (0, 1), (-1, -1), 'Times-Roman'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('FONTNAME', (0, -1), (-1, -1), 'Times-Bold'),
+        ('SPAN', (0, -1), (-2, -1)),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(table)
+    elements.append(Spacer(1, 20))
+
+    if payload['est_paye'] or payload['regle'] >= payload['total']:
+        statut = "Payé"
+    else:
+        statut = "Partiellement payé" if payload['regle'] else "Non payé"
+    elements.append(Paragraph(f"<b>Montant réglé :</b> {_ariary(payload['regle'])}", info_style))
+    elements.append(Paragraph(f"<b>Statut :</b> {statut}", info_style))
+
+    elements.append(Spacer(1, 30))
+    elements.append(Paragraph("Le Directeur", nom_centre_style))
+    elements.append(Spacer(1, 40))
+    elements.append(Paragraph("RANDRIAMAHARO Mamy", nom_centre_style))
+    return elements
+
+
+def construire_fiche(payload):
+    """Rend la fiche de paie d'un professeur et retourne les octets du PDF."""
+    buffer = io.BytesIO()
+    _document(buffer).build(_elements_fiche(payload), onFirstPage=header_footer, onLaterPages=header_footer)
+    return buffer.getvalue()
+
+
+# ---------------- Archive ----------------
+def ecrire_fiches_zip(chemin, annee_scolaire, mois, professeur_id=None, workers=None, taille_lot=None):
+    """
+    Rend toutes les fiches du mois par lots (pool de processus des bulletins si
+    workers > 1) et les écrit au fil de l'eau dans une archive ZIP.
+    Utilisée par la vue (tâche de fond) et par la commande fiches_paie.
+    Retourne le nombre de fiches.
+    """
+    payloads = payloads_fiches(annee_scolaire, mois, professeur_id)
+    pdfs = rendre_en_parallele(payloads, fonction=construire_fiche, workers=workers, taille_lot=taille_lot)
+    with open(chemin, 'wb') as archive:
+        for morceau in flux_zip((nom_fichier(payload), pdf) for payload, pdf in zip(payloads, pdfs)):
+            archive.write(morceau)
+    return len(payloads)
@@ -0,0 +1,199 @@
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.db.models import Sum, Count, Min, Q, Case, When, Value, IntegerField
+
+from .models import FraisMensuel, Paiement
+
+# Le tableau de bord et sa version vivent dans le cache partagé (CACHES['default']) :
+# une écriture faite par un worker ou par une commande (traiter_webhooks) invalide
+# le tableau de tous les workers. Le délai (secondes) n'est qu'un filet de sécurité
+# pour une écriture qui aurait échappé à l'invalidation.
+TABLEAU_TTL = 300
+
+
+# ---------------- Cache ----------------
+def _version():
+    return cache.get_or_set("finances:version", 1, None)
+
+
+def invalider_finances():
+    """
+    À appeler après toute écriture sur les frais ou les paiements (y compris en masse),
+    depuis une vue comme depuis une commande : la version est dans le cache partagé.
+    """
+    try:
+        cache.incr("finances:version")
+    except ValueError:
+        cache.set("finances:version", 1, None)
+
+
+# ---------------- Tableau de bord ----------------
+def _totaux(lignes):
+    facture = lignes['facture'] or 0
+    encaisse = lignes['encaisse'] or 0
+    return {
+        "facture": facture,
+        "encaisse": encaisse,
+        "reste": facture - encaisse,
+        "taux_recouvrement": round(float(encaisse) / float(facture) * 100, 2) if facture else 0,
+        "nb_frais": lignes['nb_frais'],
+        "nb_payes": lignes['nb_payes'],
+    }
+
+
+def calculer_tableau(annee_scolaire):
+    """Totaux facturé / encaissé de l'année, par classe, par mois et par mode de paiement (3 requêtes)."""
+    frais = FraisMensuel.objects.filter(annee_scolaire=annee_scolaire)
+    agregats = {
+        'facture': Sum('montant'),
+        'encaisse': Sum('montant', filter=Q(est_paye=True)),
+        'nb_frais': Count('id'),
+        'nb_payes': Count('id', filter=Q(est_paye=True)),
+    }
+
+    par_classe = (
+        frais.values_list('etudiant__classe__niveau', 'etudiant__classe__ordre')
+        .annotate(**agregats)
+        .order_by('etudiant__classe__ordre')
+    )
+    ordre_mois = {mois: i for i, mois in enumerate(settings.MOIS_SCOLAIRES)}
+    par_mois = sorted(
+        frais.values('mois').annotate(**agregats).order_by(),
+        key=lambda ligne: ordre_mois.get(ligne['mois'], len(ordre_mois))
+    )
+    par_mode = (
+        frais.filter(est_paye=True)
+        .values_list('paiement__mode_paiement')
+        .annotate(encaisse=Sum('montant'), nb_payes=Count('id'))
+        .order_by('-encaisse')
+    )
+
+    # Le total de l'année est la somme des lignes par mois : pas de requête de plus
+    total = {cle: sum(ligne[cle] or 0 for ligne in par_mois) for cle in agregats}
+
+    return {
+        "annee_scolaire": annee_scolaire,
+        "total": _totaux(total),
+        "par_classe": [
+            {"classe": niveau, **_totaux(dict(zip(agregats, valeurs)))}
+            for niveau, _, *valeurs in par_classe
+        ],
+        "par_mois": [{"mois": ligne.pop('mois'), **_totaux(ligne)} for ligne in par_mois],
+        "par_mode": [
+            {"mode_paiement": mode or "Inconnu", "encaisse": encaisse, "nb_payes": nb_payes}
+            for mode, encaisse, nb_payes in par_mode
+        ],
+    }
+
+
+def tableau_de_bord(annee_scolaire):
+    """Tableau de bord en cache, invalidé par version à chaque écriture de paiement."""
+    cle = f"finances:tableau:{_version()}:{annee_scolaire}"
+    tableau = cache.get(cle)
+    if tableau is None:
+        tableau = calculer_tableau(annee_scolaire)
+        cache.set(cle, tableau, TABLEAU_TTL)
+    return tableau
+
+
+# ---------------- Impayés ----------------
+COLONNES_IMPAYES = [
+    'etudiant_id', 'nom', 'prenom', 'classe', 'nb_mois_impayes', 'montant_du', 'mois_plus_ancien', 'mois_impayes'
+]
+
+
+def _rang_mois(valeurs, defaut=0):
+    """Expression SQL : valeur associée au mois dans l'ordre de l'année scolaire, `defaut` hors de cette liste."""
+    return Case(
+        *[When(mois=mois, then=Value(valeur)) for mois, valeur in valeurs],
+        default=Value(defaut),
+        output_field=IntegerField()
+    )
+
+
+def impayes(annee_scolaire, classe_id=None):
+    """
+    Une ligne par étudiant ayant des frais impayés, calculée en base :
+    nombre de mois, montant dû, mois le plus ancien (Min du rang) et
+    liste des mois (somme de bits 2**rang, un mois n'existant qu'une fois par étudiant et par année).
+    Un mois hors de MOIS_SCOLAIRES compte dans le nombre et le montant, mais ni dans
+    le mois le plus ancien (rang au-delà des autres) ni dans la liste (bit nul).
+    """
+    mois = settings.MOIS_SCOLAIRES
+    frais = FraisMensuel.objects.filter(annee_scolaire=annee_scolaire, est_paye=False, etudiant__isnull=False)
+    if classe_id:
+        frais = frais.filter(etudiant__classe_id=classe_id)
+    return (
+        frais.values_list('etudiant_id', 'etudiant__nom', 'etudiant__prenom', 'etudiant__classe__niveau')
+        .annotate(
+            nb_mois=Count('id'),
+            montant_du=Sum('montant'),
+            rang_plus_ancien=Min(_rang_mois(((m, i + 1) for i, m in enumerate(mois)), defaut=len(mois) + 1)),
+            masque=Sum(_rang_mois((m, 2 ** i) for i, m in enumerate(mois))),
+        )
+        .order_by('etudiant__classe__ordre', 'etudiant__nom', 'etudiant__prenom', 'etudiant_id')
+    )
+
+
+def ligne_impayes(ligne):
+    """Ligne brute de impayes() -> valeurs de COLONNES_IMPAYES."""
+    mois = settings.MOIS_SCOLAIRES
+    etudiant_id, nom, prenom, classe, nb_mois, montant_du, rang, masque = ligne
+    return (
+        etudiant_id, nom, prenom, classe, nb_mois, montant_du,
+        mois[rang - 1] if rang <= len(mois) else None,
+        [m for i, m in enumerate(mois) if masque & (1 << i)],
+    )
+
+
+# ---------------- Grand livre ----------------
+COLONNES_GRAND_LIVRE = [
+    'paiement_id', 'date', 'etudiant_id', 'nom', 'prenom', 'classe',
+    'mois_couverts', 'montant_total', 'mode_paiement', 'statut', 'stripe_session_id'
+]
+TAILLE_LOT_GRAND_LIVRE = 5000
+
+
+def grand_livre(du=None, au=None):
+    """
+    Générateur : une ligne par paiement (dates locales, sans fuseau), en mémoire constante.
+    Une seule requête (jointure externe sur les mois couverts) lue par curseur côté serveur ;
+    les lignes d'un même paiement se suivent et sont regroupées au vol.
+    """
+    paiements = Paiement.objects.all()
+    if du:
+        paiements = paiements.filter(date_creation__date__gte=du)
+    if au:
+        paiements = paiements.filter(date_creation__date__lte=au)
+
+    lignes = (
+        paiements.values_list(
+            'id', 'date_creation', 'etudiant_id', 'etudiant__nom', 'etudiant__prenom',
+            'etudiant__classe__niveau', 'montant_total', 'mode_paiement', 'statut', 'stripe_session_id',
+            'frais_mensuels__mois', 'frais_mensuels__annee_scolaire'
+        )
+        .order_by('date_creation', 'id', 'frais_mensuels__id')
+        .iterator(chunk_size=TAILLE_LOT_GRAND_LIVRE)
+    )
+    for _, groupe in groupby(lignes, key=lambda ligne: ligne[0]):
+        groupe = list(groupe)
+        paiement_id, date, etudiant_id, nom, prenom, classe, montant, mode, statut, session_id = groupe[0][:10]
+        mois = ", ".join(f"{m} {annee}" for *_, m, annee in groupe if m)
+        yield (
+            paiement_id, timezone.localtime(date).replace(tzinfo=None, microsecond=0), etudiant_id, nom, prenom,
+            classe, mois, montant, mode, statut, session_id
+        )
+
+
+def ecrire_grand_livre_xlsx(chemin, du=None, au=None):
+    """Classeur XLSX du grand livre, écrit ligne à ligne (openpyxl en mode write_only)."""
+    from openpyxl import Workbook
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet("Grand livre")
+    feuille.append(COLONNES_GRAND_LIVRE)
+    for ligne in grand_livre(du, au):
+        feuille.append(ligne)
+    classeur.save(chemin)
@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.models import User, Classe, Matiere, Evaluation, Note
+from api.promotion import planifier_promotion, appliquer_promotion
+from api.moyennes import reconstruire_moyennes
+
+
+class AnnulerBench(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Mesure la promotion sur des données synthétiques (annulées à la fin)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--etudiants', type=int, default=20000)
+        parser.add_argument('--notes', type=int, default=5, help="Notes par étudiant")
+        parser.add_argument('--classes', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._bench(options['etudiants'], options['notes'], options['classes'])
+                raise AnnulerBench()
+        except AnnulerBench:
+            self.stdout.write("Données de test annulées.")
+
+    def _bench(self, nb_etudiants, nb_notes, nb_classes):
+        debut = time.perf_counter()
+        classes = Classe.objects.bulk_create([
+            Classe(niveau=f"Bench {i}", ordre=1000 + i) for i in range(nb_classes)
+        ])
+        prof = User.objects.create(
+            nom="Bench", prenom="Prof", email="bench.prof@bench.local", role='prof', password='!'
+        )
+        evaluations = {}
+        for classe in classes:
+            matiere = Matiere.objects.create(nom="Bench", professeur=prof, classe=classe)
+            evaluations[classe.id] = Evaluation.objects.bulk_create([
+                Evaluation(nom=f"Devoir {j}", matiere=matiere) for j in range(nb_notes)
+            ])
+
+        etudiants = User.objects.bulk_create([
+            User(
+                nom=f"Etudiant{i}", prenom="Bench", email=f"bench{i}@bench.local",
+                role='etud', classe=classes[i % nb_classes], password='!'
+            )
+            for i in range(nb_etudiants)
+        ], batch_size=2000)
+
+        notes = (
+            Note(etudiant=etu, evaluation=evaluation, valeur=(etu.id * 7 + j * 3) % 21)
+            for etu in etudiants
+            for j, evaluation in enumerate(evaluations[etu.classe_id])
+        )
+        Note.objects.bulk_create(notes, batch_size=5000)
+        self.stdout.write(f"Préparation : {time.perf_counter() - debut:.2f}s")
+
+        debut = time.perf_counter()
+        reconstruire_moyennes()
+        self.stdout.write(f"Reconstruction des moyennes : {time.perf_counter() - debut:.2f}s")
+
+        with CaptureQueriesContext(connection) as requetes:
+            debut = time.perf_counter()
+            plan, erreurs = planifier_promotion()
+            duree_plan = time.perf_counter() - debut
+
+            debut = time.perf_counter()
+            appliquer_promotion(plan)
+            duree_application = time.perf_counter() - debut
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(plan)} étudiants planifiés en {duree_plan:.2f}s, "
+            f"appliqués en {duree_application:.2f}s ({len(erreurs)} erreurs)"
+        ))
+        self.stdout.write(f"Requêtes SQL : {len(requetes)}")
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.paie import calculer_paie, enregistrer_paie, verrouiller_paie, MoisInvalide
+from api.models import annee_scolaire_courante
+
+
+class Command(BaseCommand):
+    help = "Calcule la paie des professeurs (aperçu, recalcul, verrouillage d'un mois)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annee', help="Année scolaire, ex. 2025-2026 (année en cours par défaut)")
+        parser.add_argument('--mois', nargs='+', help="Mois à traiter (MOIS_SCOLAIRES par défaut)")
+        parser.add_argument('--professeur', type=int, help="Id d'un seul professeur")
+        parser.add_argument('--apercu', action='store_true', help="Calcule sans rien écrire")
+        parser.add_argument('--verrouiller', action='store_true', help="Verrouille les mois donnés")
+        parser.add_argument('--deverrouiller', action='store_true', help="Déverrouille les mois donnés")
+
+    def handle(self, *args, **options):
+        annee = options['annee'] or annee_scolaire_courante()
+        mois = options['mois']
+        debut = time.perf_counter()
+
+        try:
+            if options['verrouiller'] or options['deverrouiller']:
+                if not mois:
+                    raise CommandError("--mois est obligatoire pour (dé)verrouiller")
+                lignes = verrouiller_paie(annee, mois, verrouille=options['verrouiller'])
+                self.stdout.write(self.style.SUCCESS(f"{lignes} salaires mis à jour"))
+                return
+
+            if options['apercu']:
+                lignes = calculer_paie(annee, mois, options['professeur'])
+                total = sum(ligne['montant'] for ligne in lignes)
+                self.stdout.write(
+                    f"{len(lignes)} salaires, total {total} Ar (aperçu en {time.perf_counter() - debut:.2f}s)"
+                )
+                return
+
+            ecrites, ignorees, supprimees = enregistrer_paie(annee, mois, options['professeur'])
+        except MoisInvalide as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{ecrites} salaires écrits, {ignorees} verrouillés ignorés, {supprimees} supprimés "
+            f"en {time.perf_counter() - debut:.2f}s"
+        ))
@@ -0,0 +1,148 @@
+import hashlib
+import hmac
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from api.models import User, FraisMensuel, Paiement, EvenementStripe
+from api.paiements import traiter_lot
+
+
+def signer(payload, secret, timestamp=None):
+    """En-tête Stripe-Signature pour un payload donné (même schéma que Stripe)."""
+    timestamp = timestamp or int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def evenement_checkout(event_id, session_id, etudiant_id, frais_ids):
+    return json.dumps({
+        "id": event_id,
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": {
+            "id": session_id,
+            "object": "checkout.session",
+            "payment_status": "paid",
+            "metadata": {
+                "etudiant_id": str(etudiant_id),
+                "frais_ids": ",".join(str(i) for i in frais_ids),
+            },
+        }},
+    })
+
+
+class Command(BaseCommand):
+    help = "Test de charge du webhook Stripe : rafales de livraisons dupliquées et concurrentes, puis vidage de la boîte"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evenements', type=int, default=200, help="Nombre d'événements distincts")
+        parser.add_argument('--doublons', type=int, default=3, help="Livraisons de chaque événement")
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--url', help="URL du webhook d'un serveur lancé (client de test interne sinon)")
+        parser.add_argument('--secret', default=settings.STRIPE_WEBHOOK_SECRET or "whsec_charge_locale")
+        parser.add_argument('--garder', action='store_true', help="Ne pas supprimer les données créées")
+
+    def handle(self, *args, **options):
+        prefixe = f"charge_{uuid.uuid4().hex[:8]}"
+        etudiant = User.objects.create(
+            nom="Charge", prenom="Webhook", email=f"{prefixe}@bench.local", role='etud', password='!'
+        )
+        frais = FraisMensuel.objects.bulk_create([
+            FraisMensuel(etudiant=etudiant, mois=f"M{i}", annee_scolaire="2025-2026", montant=1000)
+            for i in range(options['evenements'])
+        ])
+
+        livraisons = [
+            evenement_checkout(f"evt_{prefixe}_{i}", f"cs_{prefixe}_{i}", etudiant.id, [f.id])
+            for i, f in enumerate(frais)
+            for _ in range(options['doublons'])
+        ]
+        random.shuffle(livraisons)
+
+        try:
+            with override_settings(STRIPE_WEBHOOK_SECRET=options['secret']):
+                envoyer = self._envoyeur(options['url'], options['secret'])
+                debut = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                    resultats = list(pool.map(envoyer, livraisons))
+                duree = time.perf_counter() - debut
+
+            # Vidage de la boîte de réception, comme le ferait `traiter_webhooks`
+            debut = time.perf_counter()
+            while traiter_lot():
+                pass
+            self.stdout.write(f"Boîte de réception vidée en {time.perf_counter() - debut:.2f}s")
+            self._rapport(etudiant, frais, resultats, duree)
+        finally:
+            if not options['garder']:
+                EvenementStripe.objects.filter(event_id__startswith=f"evt_{prefixe}_").delete()
+                etudiant.delete()
+
+    def _envoyeur(self, url, secret):
+        def par_http(payload):
+            requete = urllib.request.Request(
+                url, data=payload.encode(), method='POST',
+                headers={'Content-Type': 'application/json', 'Stripe-Signature': signer(payload, secret)}
+            )
+            debut = time.perf_counter()
+            try:
+                with urllib.request.urlopen(requete, timeout=30) as reponse:
+                    statut = reponse.status
+            except urllib.error.HTTPError as e:
+                statut = e.code
+            return statut, time.perf_counter() - debut
+
+        def par_client(payload):
+            client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+            debut = time.perf_counter()
+            try:
+                reponse = client.post(
+                    reverse('stripe-webhook'), data=payload, content_type='application/json',
+                    HTTP_STRIPE_SIGNATURE=signer(payload, secret)
+                )
+                statut = reponse.status_code
+            except Exception as e:
+                statut = type(e).__name__
+            finally:
+                connections.close_all()
+            return statut, time.perf_counter() - debut
+
+        return par_http if url else par_client
+
+    def _rapport(self, etudiant, frais, resultats, duree):
+        statuts = Counter(statut for statut, _ in resultats)
+        latences = sorted(latence for _, latence in resultats)
+        p50 = latences[len(latences) // 2] * 1000
+        p95 = latences[int(len(latences) * 0.95) - 1] * 1000
+
+        paiements = Paiement.objects.filter(etudiant=etudiant).count()
+        liens = Counter(
+            Paiement.frais_mensuels.through.objects
+            .filter(fraismensuel__etudiant=etudiant)
+            .values_list('fraismensuel_id', flat=True)
+        )
+        non_payes = FraisMensuel.objects.filter(etudiant=etudiant, est_paye=False).count()
+        doubles = sum(1 for n in liens.values() if n > 1)
+
+        self.stdout.write(
+            f"{len(resultats)} livraisons en {duree:.2f}s ({len(resultats) / duree:.0f}/s), "
+            f"p50 {p50:.1f} ms, p95 {p95:.1f} ms, statuts {dict(statuts)}"
+        )
+        self.stdout.write(f"Paiements : {paiements} / {len(frais)} attendus, frais non payés : {non_payes}")
+        if paiements == len(frais) and non_payes == 0 and doubles == 0:
+            self.stdout.write(self.style.SUCCESS("✅ Aucun paiement en double"))
+        else:
+            self.stdout.write(self.style.ERROR(f"❌ {doubles} frais rattachés à plusieurs paiements"))
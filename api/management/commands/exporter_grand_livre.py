@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.exports import flux_csv
+from api.finances import grand_livre, ecrire_grand_livre_xlsx, COLONNES_GRAND_LIVRE
+
+
+class Command(BaseCommand):
+    help = "Exporte le grand livre des paiements (CSV ou XLSX selon l'extension du fichier)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('sortie', help="Fichier .csv ou .xlsx")
+        parser.add_argument('--du', type=parse_date, help="Date de début AAAA-MM-JJ")
+        parser.add_argument('--au', type=parse_date, help="Date de fin AAAA-MM-JJ")
+
+    def handle(self, *args, **options):
+        sortie = options['sortie']
+        debut = time.perf_counter()
+        if sortie.endswith('.xlsx'):
+            ecrire_grand_livre_xlsx(sortie, options['du'], options['au'])
+        elif sortie.endswith('.csv'):
+            with open(sortie, 'w', encoding='utf-8', newline='') as fichier:
+                fichier.writelines(flux_csv(COLONNES_GRAND_LIVRE, grand_livre(options['du'], options['au'])))
+        else:
+            raise CommandError("Le fichier de sortie doit finir par .csv ou .xlsx")
+        self.stdout.write(self.style.SUCCESS(f"Grand livre écrit dans {sortie} en {time.perf_counter() - debut:.1f}s"))
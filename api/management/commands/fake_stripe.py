@@ -0,0 +1,155 @@
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+import stripe
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.models import User, FraisMensuel
+
+
+def serveur_stripe(port, latence=0, taux_erreur=0):
+    """
+    Faux serveur Stripe (checkout sessions uniquement) :
+    POST /v1/checkout/sessions et GET /v1/checkout/sessions/<id>.
+    """
+    sessions = {}
+    verrou = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def _repondre(self, code, corps):
+            contenu = json.dumps(corps).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(contenu)))
+            self.end_headers()
+            self.wfile.write(contenu)
+
+        def _simuler(self):
+            time.sleep(latence / 1000)
+            if random.random() < taux_erreur:
+                self._repondre(500, {"error": {"type": "api_error", "message": "Erreur simulée"}})
+                return False
+            return True
+
+        def do_POST(self):
+            corps = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+            if self.path != "/v1/checkout/sessions":
+                return self._repondre(404, {"error": {"type": "invalid_request_error", "message": self.path}})
+            if not self._simuler():
+                return
+            champs = dict(parse_qsl(corps))
+            session_id = f"cs_test_{uuid.uuid4().hex}"
+            session = {
+                "id": session_id,
+                "object": "checkout.session",
+                "url": f"http://127.0.0.1:{port}/pay/{session_id}",
+                "status": "open",
+                "payment_status": "unpaid",
+                "customer_email": champs.get("customer_email"),
+                "metadata": {
+                    cle[len("metadata["):-1]: valeur
+                    for cle, valeur in champs.items() if cle.startswith("metadata[")
+                },
+            }
+            with verrou:
+                sessions[session_id] = session
+            self._repondre(200, session)
+
+        def do_GET(self):
+            session_id = self.path.rsplit("/", 1)[-1]
+            if not self._simuler():
+                return
+            with verrou:
+                session = sessions.get(session_id)
+            if session is None:
+                return self._repondre(404, {"error": {"type": "invalid_request_error", "message": "No such session"}})
+            self._repondre(200, session)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+
+class Command(BaseCommand):
+    help = "Faux serveur Stripe local (STRIPE_API_BASE=http://127.0.0.1:<port>) ; --bench mesure le checkout complet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument('--latence', type=float, default=0, help="Latence simulée (ms)")
+        parser.add_argument('--taux-erreur', type=float, default=0, help="Part de réponses 500 (0 à 1)")
+        parser.add_argument('--bench', type=int, default=0, help="Nombre de checkouts à mesurer puis quitter")
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--frais', type=int, default=3, help="Frais par session")
+
+    def handle(self, *args, **options):
+        serveur = serveur_stripe(options['port'], options['latence'], options['taux_erreur'])
+        if not options['bench']:
+            self.stdout.write(f"🧪 Faux Stripe sur http://127.0.0.1:{options['port']} (Ctrl+C pour arrêter)")
+            try:
+                serveur.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            return
+
+        threading.Thread(target=serveur.serve_forever, daemon=True).start()
+        stripe.api_base = f"http://127.0.0.1:{options['port']}"
+        stripe.api_key = stripe.api_key or "sk_test_local"
+        try:
+            self._bench(options['bench'], options['threads'], options['frais'])
+        finally:
+            serveur.shutdown()
+
+    def _bench(self, nombre, threads, nb_frais):
+        etudiant = User.objects.create(
+            nom="Bench", prenom="Checkout", email=f"checkout_{uuid.uuid4().hex[:8]}@bench.local",
+            role='etud', password='!'
+        )
+        try:
+            frais_ids = [f.id for f in FraisMensuel.objects.bulk_create([
+                FraisMensuel(etudiant=etudiant, mois=f"M{i}", annee_scolaire="2025-2026", montant=50000)
+                for i in range(nb_frais)
+            ])]
+            jeton = str(AccessToken.for_user(etudiant))
+
+            def checkout(_):
+                client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+                debut = time.perf_counter()
+                try:
+                    reponse = client.post(
+                        reverse('stripe-session'), data={"frais_ids": frais_ids},
+                        content_type='application/json', HTTP_AUTHORIZATION=f"Bearer {jeton}"
+                    )
+                    return reponse.status_code, time.perf_counter() - debut
+                finally:
+                    connections.close_all()
+
+            debut = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                resultats = list(pool.map(checkout, range(nombre)))
+            duree = time.perf_counter() - debut
+        finally:
+            etudiant.delete()
+
+        latences = sorted(latence for _, latence in resultats)
+        statuts = {}
+        for statut, _ in resultats:
+            statuts[statut] = statuts.get(statut, 0) + 1
+        self.stdout.write(
+            f"{nombre} checkouts en {duree:.2f}s ({nombre / duree:.0f}/s), "
+            f"p50 {latences[len(latences) // 2] * 1000:.1f} ms, "
+            f"p95 {latences[int(len(latences) * 0.95) - 1] * 1000:.1f} ms, statuts {statuts}"
+        )
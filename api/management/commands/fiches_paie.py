@@ -0,0 +1,41 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.fiches_paie import ecrire_fiches_zip
+from api.models import annee_scolaire_courante
+from api.paie import MoisInvalide
+
+
+class Command(BaseCommand):
+    help = "Génère les fiches de paie PDF d'un mois dans une archive ZIP"
+
+    def add_arguments(self, parser):
+        parser.add_argument('sortie', help="Chemin de l'archive ZIP à écrire")
+        parser.add_argument('--mois', required=True)
+        parser.add_argument('--annee', help="Année scolaire, ex. 2025-2026 (année en cours par défaut)")
+        parser.add_argument('--professeur', type=int, help="Id d'un seul professeur")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--taille-lot', type=int, default=settings.BULLETINS_TAILLE_LOT)
+
+    def handle(self, *args, **options):
+        annee = options['annee'] or annee_scolaire_courante()
+        debut = time.perf_counter()
+        try:
+            nombre = ecrire_fiches_zip(
+                options['sortie'], annee, options['mois'], options['professeur'],
+                workers=options['workers'], taille_lot=options['taille_lot']
+            )
+        except MoisInvalide as e:
+            raise CommandError(str(e))
+        duree = time.perf_counter() - debut
+
+        if not nombre:
+            os.remove(options['sortie'])
+            raise CommandError("Aucun salaire calculé pour ce mois (manage.py calculer_paie)")
+        self.stdout.write(self.style.SUCCESS(
+            f"{nombre} fiches de paie en {duree:.2f}s "
+            f"({nombre / duree:.1f} fiches/s, {options['workers']} workers)"
+        ))
@@ -0,0 +1,47 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import User, Classe
+from api.bulletins import payloads_etudiants, rendre_en_parallele, nom_fichier, flux_zip
+
+
+class Command(BaseCommand):
+    help = "Génère les bulletins d'une classe (ou de tout l'établissement) dans une archive ZIP"
+
+    def add_arguments(self, parser):
+        parser.add_argument('sortie', help="Chemin de l'archive ZIP à écrire")
+        parser.add_argument('--classe', help="Niveau de la classe (toutes les classes si absent)")
+        parser.add_argument('--semestre', type=int, default=2)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--taille-lot', type=int, default=settings.BULLETINS_TAILLE_LOT)
+
+    def handle(self, *args, **options):
+        etudiants = User.objects.filter(role='etud').select_related('classe').order_by('classe__ordre', 'nom', 'prenom')
+        if options['classe']:
+            classe = Classe.objects.filter(niveau=options['classe']).first()
+            if not classe:
+                raise CommandError(f"Classe introuvable : {options['classe']}")
+            etudiants = etudiants.filter(classe=classe)
+
+        payloads = payloads_etudiants(etudiants, semestre=options['semestre'])
+        if not payloads:
+            raise CommandError("Aucun étudiant à traiter")
+
+        debut = time.perf_counter()
+        pdfs = rendre_en_parallele(payloads, workers=options['workers'], taille_lot=options['taille_lot'])
+        fichiers = (
+            (f"{payload['classe'] or 'sans_classe'}/{payload['etudiant_id']}_{nom_fichier(payload)}", pdf)
+            for payload, pdf in zip(payloads, pdfs)
+        )
+        with open(options['sortie'], 'wb') as archive:
+            for morceau in flux_zip(fichiers):
+                archive.write(morceau)
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(payloads)} bulletins en {duree:.2f}s "
+            f"({len(payloads) / duree:.1f} bulletins/s, {options['workers']} workers)"
+        ))
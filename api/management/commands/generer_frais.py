@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Classe, annee_scolaire_courante
+from api.paie import MoisInvalide
+from api.paiements import generer_frais
+
+
+class Command(BaseCommand):
+    help = "Génère les frais mensuels de l'année scolaire pour tous les étudiants actifs (relançable)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annee', help="Année scolaire, ex. 2025-2026 (année en cours par défaut)")
+        parser.add_argument('--mois', nargs='+', help="Mois à générer (MOIS_SCOLAIRES par défaut)")
+        parser.add_argument('--classe', help="Niveau de la classe (toutes les classes si absent)")
+
+    def handle(self, *args, **options):
+        classe_id = None
+        if options['classe']:
+            classe = Classe.objects.filter(niveau=options['classe']).first()
+            if not classe:
+                raise CommandError(f"Classe introuvable : {options['classe']}")
+            classe_id = classe.id
+
+        annee = options['annee'] or annee_scolaire_courante()
+        debut = time.perf_counter()
+        try:
+            crees, nb_etudiants = generer_frais(annee, options['mois'], classe_id)
+        except MoisInvalide as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"{crees} frais créés pour {nb_etudiants} étudiants ({annee}) en {time.perf_counter() - debut:.2f}s"
+        ))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.moyennes import reconstruire_moyennes
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les tables de moyennes (par matière et par semestre) à partir des notes"
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        nb_matieres, nb_semestres = reconstruire_moyennes()
+        self.stdout.write(self.style.SUCCESS(
+            f"{nb_matieres} moyennes par matière et {nb_semestres} moyennes de semestre "
+            f"reconstruites en {time.perf_counter() - debut:.2f}s"
+        ))
@@ -0,0 +1,42 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import EvenementStripe
+from api.paiements import traiter_lot, metriques_inbox, TAILLE_LOT_INBOX
+
+
+class Command(BaseCommand):
+    help = "Vide la boîte de réception des webhooks Stripe (réessais avec backoff, abandon après N échecs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT_INBOX)
+        parser.add_argument('--continu', action='store_true', help="Tourne en boucle (worker)")
+        parser.add_argument('--intervalle', type=float, default=1.0, help="Pause (s) quand la boîte est vide")
+        parser.add_argument('--rejouer', action='store_true', help="Remet les événements abandonnés en attente")
+        parser.add_argument('--metriques', action='store_true', help="Affiche le retard de la boîte et quitte")
+
+    def handle(self, *args, **options):
+        if options['metriques']:
+            self.stdout.write(json.dumps(metriques_inbox(), indent=2, ensure_ascii=False))
+            return
+
+        if options['rejouer']:
+            n = EvenementStripe.objects.filter(statut='Abandonné').update(
+                statut='En attente', tentatives=0, prochaine_tentative=timezone.now(), date_traitement=None
+            )
+            self.stdout.write(f"{n} événements remis en attente")
+
+        while True:
+            bilan = traiter_lot(options['taille_lot'])
+            if bilan:
+                self.stdout.write(
+                    f"✅ {bilan['traites']} traités, {bilan['reessais']} à réessayer, {bilan['abandonnes']} abandonnés"
+                )
+            # Lot incomplet : plus rien de dû pour l'instant
+            if sum(bilan.values()) < options['taille_lot']:
+                if not options['continu']:
+                    break
+                time.sleep(options['intervalle'])
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 15:40
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def supprimer_doublons_notes(apps, schema_editor):
+    # Garde la note la plus récente pour chaque couple (etudiant, evaluation)
+    Note = apps.get_model('api', 'Note')
+    doublons = (
+        Note.objects.values('etudiant_id', 'evaluation_id')
+        .annotate(dernier_id=Max('id'), nombre=Count('id'))
+        .filter(nombre__gt=1)
+    )
+    for doublon in doublons:
+        Note.objects.filter(
+            etudiant_id=doublon['etudiant_id'],
+            evaluation_id=doublon['evaluation_id']
+        ).exclude(id=doublon['dernier_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_salle_unite_evenement_fraismensuel_fraispaiement_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(supprimer_doublons_notes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='note',
+            unique_together={('etudiant', 'evaluation')},
+        ),
+    ]
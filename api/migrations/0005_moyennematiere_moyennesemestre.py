@@ -0,0 +1,78 @@
+# Generated by Django 6.0 on 2026-10-18 16:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def remplir_moyennes(apps, schema_editor):
+    Note = apps.get_model('api', 'Note')
+    MoyenneMatiere = apps.get_model('api', 'MoyenneMatiere')
+    MoyenneSemestre = apps.get_model('api', 'MoyenneSemestre')
+
+    agregats = (
+        Note.objects.values_list('etudiant_id', 'evaluation__matiere_id', 'evaluation__semestre')
+        .annotate(somme=Sum('valeur'), nombre=Count('id'))
+        .order_by()
+    )
+    MoyenneMatiere.objects.bulk_create([
+        MoyenneMatiere(
+            etudiant_id=etudiant_id, matiere_id=matiere_id, semestre=semestre,
+            somme=somme, nombre=nombre, moyenne=somme / nombre
+        )
+        for etudiant_id, matiere_id, semestre, somme, nombre in agregats
+    ], batch_size=5000)
+
+    semestres = (
+        MoyenneMatiere.objects.values_list('etudiant_id', 'semestre')
+        .annotate(somme=Sum('somme'), nombre=Sum('nombre'))
+        .order_by()
+    )
+    MoyenneSemestre.objects.bulk_create([
+        MoyenneSemestre(
+            etudiant_id=etudiant_id, semestre=semestre,
+            somme=somme, nombre=nombre, moyenne=somme / nombre
+        )
+        for etudiant_id, semestre, somme, nombre in semestres
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_note_unique_etudiant_evaluation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoyenneMatiere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semestre', models.PositiveSmallIntegerField(choices=[(1, 'Semestre 1'), (2, 'Semestre 2')])),
+                ('somme', models.FloatField(default=0)),
+                ('nombre', models.PositiveIntegerField(default=0)),
+                ('moyenne', models.FloatField(default=0)),
+                ('etudiant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moyennes_matieres', to=settings.AUTH_USER_MODEL)),
+                ('matiere', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moyennes', to='api.matiere')),
+            ],
+            options={
+                'unique_together': {('etudiant', 'matiere', 'semestre')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MoyenneSemestre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semestre', models.PositiveSmallIntegerField(choices=[(1, 'Semestre 1'), (2, 'Semestre 2')])),
+                ('somme', models.FloatField(default=0)),
+                ('nombre', models.PositiveIntegerField(default=0)),
+                ('moyenne', models.FloatField(default=0)),
+                ('etudiant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moyennes_semestres', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('etudiant', 'semestre')},
+            },
+        ),
+        migrations.RunPython(remplir_moyennes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_moyennematiere_moyennesemestre'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvenementStripe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True)),
+                ('type', models.CharField(max_length=100)),
+                ('date_reception', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-18 17:40
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def marquer_traites(apps, schema_editor):
+    # Les événements existants ont été traités de façon synchrone par l'ancien webhook
+    EvenementStripe = apps.get_model('api', 'EvenementStripe')
+    EvenementStripe.objects.update(statut='Traité', date_traitement=F('date_reception'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_evenementstripe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evenementstripe',
+            name='date_traitement',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='evenementstripe',
+            name='erreur',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='evenementstripe',
+            name='payload',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='evenementstripe',
+            name='prochaine_tentative',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='evenementstripe',
+            name='statut',
+            field=models.CharField(choices=[('En attente', 'En attente'), ('Traité', 'Traité'), ('Abandonné', 'Abandonné')], default='En attente', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='evenementstripe',
+            name='tentatives',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(marquer_traites, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='evenementstripe',
+            index=models.Index(fields=['statut', 'prochaine_tentative'], name='api_eveneme_statut_5ede5d_idx'),
+        ),
+    ]
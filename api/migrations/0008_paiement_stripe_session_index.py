@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_evenementstripe_inbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paiement',
+            name='stripe_session_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-18 18:55
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def fusionner_doublons_frais(apps, schema_editor):
+    # Garde un seul frais par (etudiant, mois, annee_scolaire) : de préférence un frais payé.
+    # Les paiements des doublons sont rattachés au frais conservé.
+    FraisMensuel = apps.get_model('api', 'FraisMensuel')
+    Lien = apps.get_model('api', 'Paiement').frais_mensuels.through
+    doublons = (
+        FraisMensuel.objects.filter(etudiant__isnull=False)
+        .values('etudiant_id', 'mois', 'annee_scolaire')
+        .annotate(nombre=Count('id'))
+        .filter(nombre__gt=1)
+    )
+    for doublon in doublons:
+        frais = list(
+            FraisMensuel.objects.filter(
+                etudiant_id=doublon['etudiant_id'],
+                mois=doublon['mois'],
+                annee_scolaire=doublon['annee_scolaire']
+            ).order_by('-est_paye', 'id')
+        )
+        garde, autres = frais[0], [f.id for f in frais[1:]]
+        deja_lies = set(Lien.objects.filter(fraismensuel_id=garde.id).values_list('paiement_id', flat=True))
+        Lien.objects.bulk_create([
+            Lien(paiement_id=paiement_id, fraismensuel_id=garde.id)
+            for paiement_id in set(
+                Lien.objects.filter(fraismensuel_id__in=autres).values_list('paiement_id', flat=True)
+            ) - deja_lies
+        ])
+        FraisMensuel.objects.filter(id__in=autres).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_paiement_stripe_session_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionner_doublons_frais, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='fraismensuel',
+            unique_together={('etudiant', 'mois', 'annee_scolaire')},
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_fraismensuel_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fraismensuel',
+            index=models.Index(fields=['annee_scolaire', 'est_paye'], name='api_fraisme_annee_s_60dcf0_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_fraismensuel_annee_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fraismensuel',
+            index=models.Index(fields=['etudiant', 'annee_scolaire', 'est_paye'], name='api_fraisme_etudian_85145b_idx'),
+        ),
+    ]
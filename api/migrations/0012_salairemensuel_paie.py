@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 21:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def supprimer_doublons_salaires(apps, schema_editor):
+    # Un seul salaire par (professeur, matiere, mois, annee_scolaire) : on garde le salaire payé, sinon le plus récent
+    SalaireMensuel = apps.get_model('api', 'SalaireMensuel')
+    doublons = (
+        SalaireMensuel.objects.values('professeur_id', 'matiere_id', 'mois', 'annee_scolaire')
+        .annotate(nombre=Count('id'))
+        .filter(nombre__gt=1)
+    )
+    for doublon in doublons:
+        salaires = SalaireMensuel.objects.filter(
+            professeur_id=doublon['professeur_id'],
+            matiere_id=doublon['matiere_id'],
+            mois=doublon['mois'],
+            annee_scolaire=doublon['annee_scolaire']
+        ).order_by('-est_paye', '-id')
+        salaires.exclude(id=salaires[0].id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_fraismensuel_impayes_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salairemensuel',
+            name='heures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='salairemensuel',
+            name='heures_absence',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='salairemensuel',
+            name='verrouille',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(supprimer_doublons_salaires, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='salairemensuel',
+            unique_together={('professeur', 'matiere', 'mois', 'annee_scolaire')},
+        ),
+    ]
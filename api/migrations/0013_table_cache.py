@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 18:05
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def creer_table_cache(apps, schema_editor):
+    # Table du cache partagé (CACHES['default'] en DatabaseCache) ; sans effet avec Redis
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_salairemensuel_paie'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_table_cache, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 20:10
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def renseigner_annee_scolaire(apps, schema_editor):
+    # Lignes existantes : année scolaire de la date du paiement (août -> juillet),
+    # ce que calculait jusqu'ici le résumé des gains
+    PaiementProf = apps.get_model('api', 'PaiementProf')
+    FraisMensuelProf = apps.get_model('api', 'FraisMensuelProf')
+    par_annee = defaultdict(list)
+    for paiement_id, date_creation in PaiementProf.objects.values_list('id', 'date_creation').iterator():
+        jour = timezone.localtime(date_creation) if timezone.is_aware(date_creation) else date_creation
+        debut = jour.year if jour.month >= 8 else jour.year - 1
+        par_annee[f"{debut}-{debut + 1}"].append(paiement_id)
+    for annee_scolaire, paiements_ids in par_annee.items():
+        FraisMensuelProf.objects.filter(paiement_id__in=paiements_ids).update(annee_scolaire=annee_scolaire)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_table_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fraismensuelprof',
+            name='annee_scolaire',
+            field=models.CharField(default='', max_length=9),
+            preserve_default=False,
+        ),
+        migrations.RunPython(renseigner_annee_scolaire, migrations.RunPython.noop),
+    ]
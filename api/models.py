@@ -218,6 +218,13 @@ class FraisMensuel(models.Model):
     montant = models.DecimalField(max_digits=10, decimal_places=2)
     est_paye = models.BooleanField(default=False)
 
+    class Meta:
+        unique_together = ('etudiant', 'mois', 'annee_scolaire')
+        indexes = [
+            models.Index(fields=['annee_scolaire', 'est_paye']),
+            models.Index(fields=['etudiant', 'annee_scolaire', 'est_paye']),
+        ]
+
     def __str__(self):
         return f"{self.etudiant.username if self.etudiant else 'Inconnu'} - {self.mois} - {self.montant} Ar"
 
@@ -225,7 +232,7 @@ class Paiement(models.Model):
     etudiant = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'etud'})
     frais_mensuels = models.ManyToManyField(FraisMensuel)
     montant_total = models.DecimalField(max_digits=10, decimal_places=2)
-    stripe_session_id = models.CharField(max_length=255, blank=True, null=True)
+    stripe_session_id = models.CharField(max_length=255, blank=True, null=True, db_index=True)
     statut = models.CharField(max_length=20, choices=[
         ('En attente', 'En attente'),
         ('Payé', 'Payé'),
@@ -234,6 +241,28 @@ class Paiement(models.Model):
     date_creation = models.DateTimeField(auto_now_add=True)
     mode_paiement = models.CharField(max_length=50, blank=True, null=True)
 
+# Boîte de réception des webhooks Stripe (dédupliquée par event id, vidée par traiter_webhooks)
+class EvenementStripe(models.Model):
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    statut = models.CharField(max_length=20, choices=[
+        ('En attente', 'En attente'),
+        ('Traité', 'Traité'),
+        ('Abandonné', 'Abandonné')
+    ], default='En attente')
+    tentatives = models.PositiveIntegerField(default=0)
+    prochaine_tentative = models.DateTimeField(default=timezone.now)
+    erreur = models.TextField(blank=True)
+    date_reception = models.DateTimeField(auto_now_add=True)
+    date_traitement = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['statut', 'prochaine_tentative'])]
+
+    def __str__(self):
+        return f"{self.type} - {self.event_id}"
+
 # Salaire des professeurs
 class SalaireClasseMatiere(models.Model):
     professeur = models.ForeignKey(
@@ -277,6 +306,13 @@ class SalaireMensuel(models.Model):
 
     montant = models.DecimalField(max_digits=10, decimal_places=2)
     est_paye = models.BooleanField(default=False)
+    # Renseignés par le moteur de paie (api/paie.py)
+    heures = models.PositiveIntegerField(default=0)
+    heures_absence = models.PositiveIntegerField(default=0)
+    verrouille = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('professeur', 'matiere', 'mois', 'annee_scolaire')
 
     def __str__(self):
         return f"{self.professeur.username} - {self.matiere.nom} - {self.mois} - {self.montant} Ar"
@@ -303,10 +339,12 @@ class FraisMensuelProf(models.Model):
 
     paiement = models.ForeignKey('PaiementProf', on_delete=models.CASCADE, related_name='frais_mensuels')
     mois = models.CharField(max_length=20, choices=MOIS_CHOICES)
+    # Année scolaire du salaire réglé, pas forcément celle de la date du paiement
+    annee_scolaire = models.CharField(max_length=9)
     salaire = models.DecimalField(max_digits=12, decimal_places=2)
 
     def __str__(self):
-        return f"{self.mois} - {self.salaire} Ar"
+        return f"{self.mois} {self.annee_scolaire} - {self.salaire} Ar"
 
 class PaiementProf(models.Model):
     professeur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='paiements')
@@ -349,9 +387,40 @@ class Note(models.Model):
     valeur = models.FloatField()
     remarque = models.TextField(blank=True, null=True)
 
+    class Meta:
+        unique_together = ('etudiant', 'evaluation')
+
     def __str__(self):
         return f"{self.etudiant.nom} - {self.evaluation.nom} : {self.valeur}"
     
+# Moyennes dénormalisées, tenues à jour à chaque écriture de Note/Evaluation
+class MoyenneMatiere(models.Model):
+    etudiant = models.ForeignKey('User', on_delete=models.CASCADE, related_name='moyennes_matieres')
+    matiere = models.ForeignKey('Matiere', on_delete=models.CASCADE, related_name='moyennes')
+    semestre = models.PositiveSmallIntegerField(choices=SEMESTRES)
+    somme = models.FloatField(default=0)
+    nombre = models.PositiveIntegerField(default=0)
+    moyenne = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('etudiant', 'matiere', 'semestre')
+
+    def __str__(self):
+        return f"{self.etudiant_id} - {self.matiere_id} - S{self.semestre} : {self.moyenne:.2f}"
+
+class MoyenneSemestre(models.Model):
+    etudiant = models.ForeignKey('User', on_delete=models.CASCADE, related_name='moyennes_semestres')
+    semestre = models.PositiveSmallIntegerField(choices=SEMESTRES)
+    somme = models.FloatField(default=0)
+    nombre = models.PositiveIntegerField(default=0)
+    moyenne = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('etudiant', 'semestre')
+
+    def __str__(self):
+        return f"{self.etudiant_id} - S{self.semestre} : {self.moyenne:.2f}"
+    
 class Absence(models.Model):
     personne = models.ForeignKey(
         User,
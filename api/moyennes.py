@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.db.models import Sum, Count
+
+from .models import Note, MoyenneMatiere, MoyenneSemestre
+
+TAILLE_LOT = 5000
+
+
+def _moyenne(somme, nombre):
+    return somme / nombre if nombre else 0
+
+
+def actualiser_moyennes(cles):
+    """
+    Recalcule uniquement les moyennes touchées par une écriture.
+    cles : ensemble de (etudiant_id, matiere_id, semestre).
+    """
+    cles = {cle for cle in cles if None not in cle}
+    if not cles:
+        return
+
+    etudiants_ids = {etudiant_id for etudiant_id, _, _ in cles}
+    matieres_ids = {matiere_id for _, matiere_id, _ in cles}
+
+    agregats = (
+        Note.objects.filter(etudiant_id__in=etudiants_ids, evaluation__matiere_id__in=matieres_ids)
+        .values_list('etudiant_id', 'evaluation__matiere_id', 'evaluation__semestre')
+        .annotate(somme=Sum('valeur'), nombre=Count('id'))
+    )
+    calculees = {
+        (etudiant_id, matiere_id, semestre): (somme, nombre)
+        for etudiant_id, matiere_id, semestre, somme, nombre in agregats
+        if (etudiant_id, matiere_id, semestre) in cles
+    }
+
+    with transaction.atomic():
+        MoyenneMatiere.objects.bulk_create(
+            [
+                MoyenneMatiere(
+                    etudiant_id=etudiant_id, matiere_id=matiere_id, semestre=semestre,
+                    somme=somme, nombre=nombre, moyenne=_moyenne(somme, nombre)
+                )
+                for (etudiant_id, matiere_id, semestre), (somme, nombre) in calculees.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['etudiant', 'matiere', 'semestre'],
+            update_fields=['somme', 'nombre', 'moyenne']
+        )
+        for etudiant_id, matiere_id, semestre in cles - calculees.keys():
+            MoyenneMatiere.objects.filter(etudiant_id=etudiant_id, matiere_id=matiere_id, semestre=semestre).delete()
+
+        actualiser_semestres({(etudiant_id, semestre) for etudiant_id, _, semestre in cles})
+
+
+def actualiser_semestres(paires):
+    """Recalcule les moyennes de semestre (etudiant_id, semestre) à partir des moyennes par matière."""
+    if not paires:
+        return
+    etudiants_ids = {etudiant_id for etudiant_id, _ in paires}
+    agregats = (
+        MoyenneMatiere.objects.filter(etudiant_id__in=etudiants_ids)
+        .values_list('etudiant_id', 'semestre')
+        .annotate(somme=Sum('somme'), nombre=Sum('nombre'))
+    )
+    calculees = {
+        (etudiant_id, semestre): (somme, nombre)
+        for etudiant_id, semestre, somme, nombre in agregats
+        if (etudiant_id, semestre) in paires
+    }
+
+    MoyenneSemestre.objects.bulk_create(
+        [
+            MoyenneSemestre(
+                etudiant_id=etudiant_id, semestre=semestre,
+                somme=somme, nombre=nombre, moyenne=_moyenne(somme, nombre)
+            )
+            for (etudiant_id, semestre), (somme, nombre) in calculees.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['etudiant', 'semestre'],
+        update_fields=['somme', 'nombre', 'moyenne']
+    )
+    for etudiant_id, semestre in paires - calculees.keys():
+        MoyenneSemestre.objects.filter(etudiant_id=etudiant_id, semestre=semestre).delete()
+
+
+def reconstruire_moyennes():
+    """Reconstruit entièrement les deux tables à partir des notes, en masse."""
+    agregats = (
+        Note.objects.values_list('etudiant_id', 'evaluation__matiere_id', 'evaluation__semestre')
+        .annotate(somme=Sum('valeur'), nombre=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        MoyenneSemestre.objects.all().delete()
+        MoyenneMatiere.objects.all().delete()
+        MoyenneMatiere.objects.bulk_create(
+            (
+                MoyenneMatiere(
+                    etudiant_id=etudiant_id, matiere_id=matiere_id, semestre=semestre,
+                    somme=somme, nombre=nombre, moyenne=_moyenne(somme, nombre)
+                )
+                for etudiant_id, matiere_id, semestre, somme, nombre in agregats.iterator(chunk_size=TAILLE_LOT)
+            ),
+            batch_size=TAILLE_LOT
+        )
+        semestres = (
+            MoyenneMatiere.objects.values_list('etudiant_id', 'semestre')
+            .annotate(somme=Sum('somme'), nombre=Sum('nombre'))
+            .order_by()
+        )
+        MoyenneSemestre.objects.bulk_create(
+            (
+                MoyenneSemestre(
+                    etudiant_id=etudiant_id, semestre=semestre,
+                    somme=somme, nombre=nombre, moyenne=_moyenne(somme, nombre)
+                )
+                for etudiant_id, semestre, somme, nombre in semestres.iterator(chunk_size=TAILLE_LOT)
+            ),
+            batch_size=TAILLE_LOT
+        )
+    return MoyenneMatiere.objects.count(), MoyenneSemestre.objects.count()
+
+
+def moyennes_generales(etudiants_ids=None):
+    """Moyenne de toutes les notes de chaque étudiant, tous semestres confondus."""
+    semestres = MoyenneSemestre.objects.all()
+    if etudiants_ids is not None:
+        semestres = semestres.filter(etudiant_id__in=etudiants_ids)
+    return {
+        etudiant_id: _moyenne(somme, nombre)
+        for etudiant_id, somme, nombre in semestres.values_list('etudiant_id')
+        .annotate(somme=Sum('somme'), nombre=Sum('nombre'))
+        .values_list('etudiant_id', 'somme', 'nombre')
+        .order_by()
+    }
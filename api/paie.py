@@ -0,0 +1,258 @@
+import calendar
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import SalaireClasseMatiere, SalaireMensuel, EmploiDuTemps, Absence, FraisMensuelProf
+
+TAILLE_LOT = 2000
+
+# Les résumés des gains sont dans le cache partagé (CACHES['default']) : une
+# invalidation faite par un worker ou par la commande calculer_paie vaut pour tous.
+# Ce délai (secondes) ne couvre qu'une écriture qui aurait échappé à l'invalidation.
+GAINS_TTL = 3600
+
+# Mois dans l'ordre du calendrier : 'Janvier' -> 1 ... 'Décembre' -> 12
+NUMEROS_MOIS = {mois: i + 1 for i, (mois, _) in enumerate(FraisMensuelProf.MOIS_CHOICES)}
+# Jours de l'emploi du temps -> jour de la semaine Python (lundi = 0)
+JOURS = {jour: i for i, (jour, _) in enumerate(EmploiDuTemps.JOURS_SEMAINE)}
+
+
+class MoisInvalide(Exception):
+    pass
+
+
+def periode(mois, annee_scolaire):
+    """('Mars', '2025-2026') -> (2026, 3) : de septembre à décembre on est dans la première année."""
+    if mois not in NUMEROS_MOIS:
+        raise MoisInvalide(f"Mois inconnu : {mois}")
+    try:
+        debut, fin = (int(a) for a in annee_scolaire.split("-"))
+    except ValueError:
+        raise MoisInvalide(f"Année scolaire invalide : {annee_scolaire}")
+    numero = NUMEROS_MOIS[mois]
+    return (debut if numero >= 8 else fin), numero
+
+
+def annee_scolaire_de(jour):
+    """date(2025, 9, 15) -> '2025-2026' : l'année scolaire commence en août, comme dans periode()."""
+    debut = jour.year if jour.month >= 8 else jour.year - 1
+    return f"{debut}-{debut + 1}"
+
+
+def _jours_du_mois(annee, numero):
+    """Nombre de lundis, mardis, ... du mois : {0: 4, 1: 5, ...}."""
+    compte = defaultdict(int)
+    for jour in range(1, calendar.monthrange(annee, numero)[1] + 1):
+        compte[date(annee, numero, jour).weekday()] += 1
+    return compte
+
+
+def calculer_paie(annee_scolaire, mois=None, professeur_id=None):
+    """
+    Calcule en une passe les salaires du mois (ou des mois) sans rien écrire.
+    Salaire (professeur, matière) = taux horaire (SalaireClasseMatiere)
+      x heures de l'emploi du temps de la classe pour cette matière sur le mois
+      - heures tombant un jour d'absence non justifiée du professeur.
+    Trois requêtes quel que soit le nombre de professeurs et de mois.
+    Retourne une liste de dicts (professeur_id, matiere_id, mois, heures, heures_absence, montant).
+    """
+    mois = mois or settings.MOIS_SCOLAIRES
+    periodes = {m: periode(m, annee_scolaire) for m in mois}
+
+    tarifs = SalaireClasseMatiere.objects.all()
+    if professeur_id:
+        tarifs = tarifs.filter(professeur_id=professeur_id)
+    tarifs = list(tarifs.values_list('professeur_id', 'classe_id', 'matiere_id', 'montant'))
+
+    # Heures par semaine : {(classe, matiere): {jour_semaine: nombre de créneaux}}
+    creneaux = defaultdict(lambda: defaultdict(int))
+    for classe_id, matiere_id, jour in EmploiDuTemps.objects.values_list('classe_id', 'matiere_id', 'jour'):
+        creneaux[(classe_id, matiere_id)][JOURS[jour]] += 1
+
+    # Absences non justifiées des professeurs sur toute la période : {(professeur, mois): [(matiere, jour_semaine)]}
+    premier = min(date(a, n, 1) for a, n in periodes.values())
+    dernier = max(date(a, n, calendar.monthrange(a, n)[1]) for a, n in periodes.values())
+    absences = Absence.objects.filter(
+        personne__role='prof', justifiee=False, date__range=(premier, dernier)
+    )
+    if professeur_id:
+        absences = absences.filter(personne_id=professeur_id)
+    absences_par_mois = defaultdict(list)
+    numeros = {(a, n): m for m, (a, n) in periodes.items()}
+    for personne_id, matiere_id, jour in absences.values_list('personne_id', 'matiere_id', 'date'):
+        m = numeros.get((jour.year, jour.month))
+        if m:
+            absences_par_mois[(personne_id, m)].append((matiere_id, jour.weekday()))
+
+    lignes = {}
+    for m, (annee, numero) in periodes.items():
+        jours = _jours_du_mois(annee, numero)
+        for prof_id, classe_id, matiere_id, taux in tarifs:
+            semaine = creneaux.get((classe_id, matiere_id), {})
+            heures = sum(n * jours[jour] for jour, n in semaine.items())
+            # Une absence sans matière vaut pour toutes les matières du jour
+            heures_absence = sum(
+                semaine.get(jour, 0)
+                for absence_matiere, jour in absences_par_mois.get((prof_id, m), ())
+                if absence_matiere in (None, matiere_id)
+            )
+            heures_absence = min(heures_absence, heures)
+            cle = (prof_id, matiere_id, m)
+            ligne = lignes.setdefault(cle, {
+                "professeur_id": prof_id, "matiere_id": matiere_id, "mois": m,
+                "heures": 0, "heures_absence": 0, "montant": Decimal(0),
+            })
+            ligne["heures"] += heures
+            ligne["heures_absence"] += heures_absence
+            ligne["montant"] += taux * (heures - heures_absence)
+    return list(lignes.values())
+
+
+def enregistrer_paie(annee_scolaire, mois=None, professeur_id=None):
+    """
+    Recalcule et écrit les salaires (bulk upsert). Les lignes verrouillées ou déjà payées
+    ne sont jamais modifiées ; les lignes non verrouillées qui n'ont plus de tarif sont supprimées.
+    Retourne (écrites, ignorées car verrouillées, supprimées).
+    """
+    mois = mois or settings.MOIS_SCOLAIRES
+    lignes = calculer_paie(annee_scolaire, mois, professeur_id)
+
+    with transaction.atomic():
+        existantes = SalaireMensuel.objects.select_for_update().filter(annee_scolaire=annee_scolaire, mois__in=mois)
+        if professeur_id:
+            existantes = existantes.filter(professeur_id=professeur_id)
+        figees = set(
+            existantes.filter(verrouille=True).values_list('professeur_id', 'matiere_id', 'mois')
+        ) | set(
+            existantes.filter(est_paye=True).values_list('professeur_id', 'matiere_id', 'mois')
+        )
+
+        a_ecrire = [
+            SalaireMensuel(annee_scolaire=annee_scolaire, **ligne)
+            for ligne in lignes
+            if (ligne["professeur_id"], ligne["matiere_id"], ligne["mois"]) not in figees
+        ]
+        SalaireMensuel.objects.bulk_create(
+            a_ecrire,
+            batch_size=TAILLE_LOT,
+            update_conflicts=True,
+            unique_fields=['professeur', 'matiere', 'mois', 'annee_scolaire'],
+            update_fields=['montant', 'heures', 'heures_absence']
+        )
+
+        calculees = {(ligne["professeur_id"], ligne["matiere_id"], ligne["mois"]) for ligne in lignes}
+        obsoletes = [
+            salaire_id
+            for salaire_id, *cle in existantes.filter(verrouille=False, est_paye=False)
+            .values_list('id', 'professeur_id', 'matiere_id', 'mois')
+            if tuple(cle) not in calculees
+        ]
+        SalaireMensuel.objects.filter(id__in=obsoletes).delete()
+        # bulk_create n'envoie pas de signaux
+        transaction.on_commit(partial(invalider_gains, [professeur_id] if professeur_id else None))
+
+    return len(a_ecrire), len(lignes) - len(a_ecrire), len(obsoletes)
+
+
+def verrouiller_paie(annee_scolaire, mois, verrouille=True):
+    """Verrouille (ou déverrouille) les salaires d'un ou plusieurs mois ; retourne le nombre de lignes."""
+    return SalaireMensuel.objects.filter(annee_scolaire=annee_scolaire, mois__in=mois).update(verrouille=verrouille)
+
+
+# ---------------- Gains des professeurs ----------------
+def _version_gains():
+    return cache.get_or_set("paie:gains:version", 1, None)
+
+
+def invalider_gains(professeurs_ids=None):
+    """À appeler après une écriture de paie : pour ces professeurs, ou pour tous sans argument."""
+    if professeurs_ids is None:
+        try:
+            cache.incr("paie:gains:version")
+        except ValueError:
+            cache.set("paie:gains:version", 1, None)
+        return
+    version = _version_gains()
+    cache.delete_many([f"paie:gains:{version}:{professeur_id}" for professeur_id in professeurs_ids])
+
+
+def _rang_mois(mois):
+    """Rang du mois dans l'année scolaire (Août -> 0 ... Juillet -> 11), comme periode()."""
+    numero = NUMEROS_MOIS.get(mois)
+    return (numero - 8) % 12 if numero else 12
+
+
+def _montants(du, paye):
+    return {"du": du, "paye": paye, "reste": du - paye}
+
+
+def calculer_gains(professeurs_ids):
+    """
+    Dû (SalaireMensuel), payé (FraisMensuelProf des PaiementProf) et reste à payer
+    par mois et par année scolaire, en deux requêtes groupées quel que soit le
+    nombre de professeurs. Un mois payé compte dans l'année scolaire du salaire
+    réglé (FraisMensuelProf.annee_scolaire), quelle que soit la date du paiement.
+    Retourne {professeur_id: résumé}.
+    """
+    montants = {professeur_id: defaultdict(lambda: [Decimal(0), Decimal(0)]) for professeur_id in professeurs_ids}
+
+    dus = (
+        SalaireMensuel.objects.filter(professeur_id__in=professeurs_ids)
+        .values_list('professeur_id', 'annee_scolaire', 'mois')
+        .annotate(du=Sum('montant'))
+        .order_by()
+    )
+    for professeur_id, annee_scolaire, mois, du in dus:
+        montants[professeur_id][(annee_scolaire, mois)][0] += du
+
+    payes = (
+        FraisMensuelProf.objects.filter(paiement__professeur_id__in=professeurs_ids)
+        .values_list('paiement__professeur_id', 'annee_scolaire', 'mois')
+        .annotate(paye=Sum('salaire'))
+        .order_by()
+    )
+    for professeur_id, annee_scolaire, mois, paye in payes:
+        montants[professeur_id][(annee_scolaire, mois)][1] += paye
+
+    resumes = {}
+    for professeur_id, par_mois in montants.items():
+        annees = defaultdict(list)
+        for (annee_scolaire, mois), (du, paye) in par_mois.items():
+            annees[annee_scolaire].append({"mois": mois, **_montants(du, paye)})
+
+        lignes_annees = []
+        for annee_scolaire in sorted(annees, reverse=True):
+            lignes = sorted(annees[annee_scolaire], key=lambda ligne: _rang_mois(ligne["mois"]))
+            lignes_annees.append({
+                "annee_scolaire": annee_scolaire,
+                **_montants(sum(l["du"] for l in lignes), sum(l["paye"] for l in lignes)),
+                "mois": lignes,
+            })
+        resumes[professeur_id] = {
+            "professeur_id": professeur_id,
+            **_montants(sum(a["du"] for a in lignes_annees), sum(a["paye"] for a in lignes_annees)),
+            "annees": lignes_annees,
+        }
+    return resumes
+
+
+def gains(professeurs_ids):
+    """Résumés en cache par professeur ; les absents du cache sont recalculés ensemble."""
+    version = _version_gains()
+    cles = {professeur_id: f"paie:gains:{version}:{professeur_id}" for professeur_id in professeurs_ids}
+    en_cache = cache.get_many(cles.values())
+    manquants = [professeur_id for professeur_id, cle in cles.items() if cle not in en_cache]
+    calcules = calculer_gains(manquants) if manquants else {}
+    if calcules:
+        cache.set_many({cles[professeur_id]: resume for professeur_id, resume in calcules.items()}, GAINS_TTL)
+    return {
+        professeur_id: calcules[professeur_id] if professeur_id in calcules else en_cache[cles[professeur_id]]
+        for professeur_id in professeurs_ids
+    }
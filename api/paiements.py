@@ -0,0 +1,339 @@
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Min
+from django.utils import timezone
+
+from .models import User, FraisMensuel, Paiement, EvenementStripe, annee_scolaire_courante
+from .finances import invalider_finances
+from .paie import periode
+
+# Boîte de réception des webhooks
+TAILLE_LOT_INBOX = 100
+MAX_TENTATIVES = 8
+DELAI_BASE = 30      # secondes
+DELAI_MAX = 3600
+
+# Génération des frais mensuels
+TAILLE_LOT_FRAIS = 5000
+
+
+class MetadataInvalide(Exception):
+    pass
+
+
+class StripeIndisponible(Exception):
+    """Stripe n'est pas appelé : disjoncteur ouvert, ou statut déjà demandé par un autre processus."""
+
+    def __init__(self, message, reessayer_dans=None):
+        super().__init__(message)
+        self.reessayer_dans = reessayer_dans
+
+
+# ---------------- Frais mensuels ----------------
+def generer_frais(annee_scolaire=None, mois=None, classe_id=None):
+    """
+    Crée les frais de chaque mois pour chaque étudiant actif dont la classe a un
+    montant (FraisPaiement), par lots bulk_create. Les frais existants sont laissés
+    tels quels (ignore_conflicts sur etudiant/mois/annee_scolaire) : relançable sans risque.
+    Retourne (nombre de frais créés, nombre d'étudiants concernés).
+    MoisInvalide si un mois ou l'année scolaire n'est pas reconnu.
+    """
+    annee_scolaire = annee_scolaire or annee_scolaire_courante()
+    mois = mois or settings.MOIS_SCOLAIRES
+    for m in mois:
+        periode(m, annee_scolaire)
+
+    etudiants = User.objects.filter(role='etud', is_active=True, classe__frais__isnull=False)
+    if classe_id:
+        etudiants = etudiants.filter(classe_id=classe_id)
+    etudiants = list(etudiants.values_list('id', 'classe__frais__montant'))
+
+    # Les frais déjà présents ne sont pas reconstruits : une relance ne coûte qu'une lecture
+    existants = set(
+        FraisMensuel.objects.filter(annee_scolaire=annee_scolaire, mois__in=mois)
+        .values_list('etudiant_id', 'mois')
+        .iterator(chunk_size=TAILLE_LOT_FRAIS)
+    )
+    nouveaux = [
+        FraisMensuel(etudiant_id=etudiant_id, mois=m, annee_scolaire=annee_scolaire, montant=montant)
+        for etudiant_id, montant in etudiants
+        for m in mois
+        if (etudiant_id, m) not in existants
+    ]
+    with transaction.atomic():
+        # ignore_conflicts couvre une génération lancée en parallèle
+        FraisMensuel.objects.bulk_create(nouveaux, batch_size=TAILLE_LOT_FRAIS, ignore_conflicts=True)
+    invalider_finances()
+    return len(nouveaux), len(etudiants)
+
+
+# ---------------- Client Stripe ----------------
+def configurer_stripe():
+    """
+    Client HTTP partagé : une session requests par thread (keep-alive),
+    délai explicite et réessais bornés.
+    """
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    stripe.default_http_client = stripe.RequestsClient(timeout=settings.STRIPE_TIMEOUT)
+    stripe.max_network_retries = settings.STRIPE_MAX_RETRIES
+    if settings.STRIPE_API_BASE:
+        stripe.api_base = settings.STRIPE_API_BASE
+
+
+class Disjoncteur:
+    """
+    Après `seuil` échecs réseau/serveur consécutifs, les appels échouent aussitôt
+    pendant `delai` secondes ; ensuite un seul appel d'essai est laissé passer.
+    """
+    def __init__(self, seuil, delai):
+        self.seuil = seuil
+        self.delai = delai
+        self.echecs = 0
+        self.ouvert_depuis = None
+        self.essai_en_cours = False
+        self._lock = threading.Lock()
+
+    def _autoriser(self):
+        with self._lock:
+            if self.ouvert_depuis is None:
+                return
+            if time.monotonic() - self.ouvert_depuis >= self.delai and not self.essai_en_cours:
+                self.essai_en_cours = True
+                return
+            raise StripeIndisponible("Stripe est temporairement indisponible")
+
+    def _resultat(self, succes):
+        with self._lock:
+            self.essai_en_cours = False
+            if succes:
+                self.echecs = 0
+                self.ouvert_depuis = None
+                return
+            self.echecs += 1
+            if self.echecs >= self.seuil:
+                if self.ouvert_depuis is None:
+                    print(f"⚡ Disjoncteur Stripe ouvert après {self.echecs} échecs")
+                self.ouvert_depuis = time.monotonic()
+
+    def appeler(self, fonction, *args, **kwargs):
+        self._autoriser()
+        try:
+            resultat = fonction(*args, **kwargs)
+        except (stripe.error.APIConnectionError, stripe.error.RateLimitError):
+            self._resultat(False)
+            raise
+        except stripe.error.APIError as e:
+            # Erreurs 5xx : Stripe en difficulté ; les autres erreurs viennent de la requête
+            self._resultat((e.http_status or 500) < 500)
+            raise
+        except Exception:
+            self._resultat(True)
+            raise
+        self._resultat(True)
+        return resultat
+
+
+disjoncteur_stripe = Disjoncteur(settings.STRIPE_DISJONCTEUR_SEUIL, settings.STRIPE_DISJONCTEUR_DELAI)
+
+
+def appel_stripe(fonction, *args, **kwargs):
+    """Appel Stripe protégé par le disjoncteur (StripeIndisponible s'il est ouvert)."""
+    return disjoncteur_stripe.appeler(fonction, *args, **kwargs)
+
+
+# ---------------- Statut des sessions Checkout ----------------
+SESSIONS_TERMINEES = ('complete', 'expired')
+_verrous_sessions = {}
+_verrou_global = threading.Lock()
+
+
+def _cle_session(session_id):
+    return f"stripe:session:{session_id}"
+
+
+def _verrou_session(session_id):
+    with _verrou_global:
+        return _verrous_sessions.setdefault(session_id, threading.Lock())
+
+
+def statut_session_stripe(session_id):
+    """
+    Statut d'une session Checkout, mis en cache quelques secondes
+    (définitivement une fois la session terminée).
+    Les demandes simultanées pour la même session ne font qu'un seul appel Stripe :
+    verrou par session dans le processus, cache.add dans le cache partagé entre
+    processus. Si le détenteur du verrou ne répond pas à temps, StripeIndisponible
+    est levée (à réessayer) plutôt que d'appeler Stripe une seconde fois.
+    """
+    cle = _cle_session(session_id)
+    statut = cache.get(cle)
+    if statut is not None:
+        return statut
+
+    with _verrou_session(session_id):
+        try:
+            statut = cache.get(cle)
+            if statut is not None:
+                return statut
+
+            if cache.add(f"{cle}:verrou", 1, timeout=int(settings.STRIPE_TIMEOUT) + 1):
+                try:
+                    session = appel_stripe(stripe.checkout.Session.retrieve, session_id)
+                    statut = {
+                        "status": session.status,
+                        "payment_status": session.payment_status,
+                        "etudiant_id": (session.metadata or {}).get("etudiant_id"),
+                    }
+                    ttl = None if session.status in SESSIONS_TERMINEES else settings.STRIPE_STATUT_TTL
+                    cache.set(cle, statut, ttl)
+                finally:
+                    # Uniquement le verrou pris ici
+                    cache.delete(f"{cle}:verrou")
+                return statut
+
+            # Un autre processus interroge déjà Stripe : on attend son résultat
+            limite = time.monotonic() + settings.STRIPE_TIMEOUT
+            while time.monotonic() < limite:
+                time.sleep(0.05)
+                statut = cache.get(cle)
+                if statut is not None:
+                    return statut
+            raise StripeIndisponible("Statut de la session en cours de récupération, réessayez", reessayer_dans=1)
+        finally:
+            with _verrou_global:
+                _verrous_sessions.pop(session_id, None)
+
+
+# ---------------- Boîte de réception des webhooks ----------------
+
+
+def recevoir_evenement(event):
+    """
+    Ajoute l'événement brut à la boîte de réception, sans autre travail.
+    Un event id déjà reçu est ignoré (ignore_conflicts) : une seule requête INSERT.
+    """
+    EvenementStripe.objects.bulk_create(
+        [EvenementStripe(event_id=event['id'], type=event['type'], payload=event)],
+        ignore_conflicts=True
+    )
+
+
+def traiter_evenement(evenement):
+    """Traitement métier d'un événement de la boîte ; à appeler dans une transaction."""
+    if evenement.type == 'checkout.session.completed':
+        payer_session(evenement.payload['data']['object'])
+
+
+def delai_reessai(tentatives):
+    """Backoff exponentiel : 30 s, 1 min, 2 min, ... plafonné à 1 h."""
+    return timedelta(seconds=min(DELAI_BASE * 2 ** (tentatives - 1), DELAI_MAX))
+
+
+def traiter_lot(taille=TAILLE_LOT_INBOX):
+    """
+    Traite un lot d'événements dus. Les lignes sont verrouillées avec skip_locked :
+    plusieurs workers peuvent tourner en parallèle sans se marcher dessus.
+    Retourne un Counter {'traites', 'reessais', 'abandonnes'}.
+    """
+    bilan = Counter()
+    with transaction.atomic():
+        lot = list(
+            EvenementStripe.objects.select_for_update(skip_locked=True)
+            .filter(statut='En attente', prochaine_tentative__lte=timezone.now())
+            .order_by('prochaine_tentative', 'id')[:taille]
+        )
+        for evenement in lot:
+            maintenant = timezone.now()
+            evenement.tentatives += 1
+            try:
+                with transaction.atomic():
+                    traiter_evenement(evenement)
+            except Exception as e:
+                evenement.erreur = f"{type(e).__name__}: {e}"
+                # Metadata invalides : inutile de réessayer
+                if isinstance(e, MetadataInvalide) or evenement.tentatives >= MAX_TENTATIVES:
+                    evenement.statut = 'Abandonné'
+                    evenement.date_traitement = maintenant
+                    bilan['abandonnes'] += 1
+                    print(f"☠ Événement abandonné {evenement.event_id} : {evenement.erreur}")
+                else:
+                    evenement.prochaine_tentative = maintenant + delai_reessai(evenement.tentatives)
+                    bilan['reessais'] += 1
+            else:
+                evenement.statut = 'Traité'
+                evenement.erreur = ''
+                evenement.date_traitement = maintenant
+                bilan['traites'] += 1
+
+        EvenementStripe.objects.bulk_update(
+            lot, ['statut', 'tentatives', 'prochaine_tentative', 'erreur', 'date_traitement']
+        )
+    return bilan
+
+
+def metriques_inbox():
+    """Volume par statut et retard de la boîte de réception (en secondes)."""
+    maintenant = timezone.now()
+    par_statut = dict(EvenementStripe.objects.values_list('statut').annotate(n=Count('id')).order_by())
+    en_attente = EvenementStripe.objects.filter(statut='En attente')
+    plus_ancien = en_attente.aggregate(date=Min('date_reception'))['date']
+    traites = EvenementStripe.objects.filter(
+        statut='Traité', date_traitement__gte=maintenant - timedelta(hours=1)
+    ).annotate(retard=F('date_traitement') - F('date_reception')).aggregate(
+        moyen=Avg('retard'), max=Max('retard'), nombre=Count('id')
+    )
+    return {
+        "par_statut": par_statut,
+        "en_attente": par_statut.get('En attente', 0),
+        "dus": en_attente.filter(prochaine_tentative__lte=maintenant).count(),
+        "abandonnes": par_statut.get('Abandonné', 0),
+        "retard_plus_ancien": (maintenant - plus_ancien).total_seconds() if plus_ancien else 0,
+        "derniere_heure": {
+            "traites": traites['nombre'],
+            "retard_moyen": traites['moyen'].total_seconds() if traites['moyen'] else 0,
+            "retard_max": traites['max'].total_seconds() if traites['max'] else 0,
+        },
+    }
+
+
+def payer_session(session):
+    """Marque payés les frais de la session ; à appeler dans une transaction."""
+    metadata = session.get('metadata') or {}
+    try:
+        etudiant_id = int(metadata.get("etudiant_id"))
+        frais_ids = [int(m) for m in metadata.get("frais_ids", "").split(",")]
+    except (TypeError, ValueError):
+        raise MetadataInvalide("Metadata manquantes ou invalides")
+
+    # Verrouille les lignes : une livraison concurrente attend ici puis ne voit plus que des frais payés
+    frais = list(
+        FraisMensuel.objects.select_for_update()
+        .filter(id__in=frais_ids, etudiant_id=etudiant_id, est_paye=False)
+        .order_by('id')
+    )
+    if not frais:
+        return None
+
+    paiement = Paiement.objects.create(
+        etudiant_id=etudiant_id,
+        montant_total=sum(f.montant for f in frais),
+        stripe_session_id=session.get("id"),
+        statut="Payé",
+        mode_paiement="Stripe"
+    )
+    Paiement.frais_mensuels.through.objects.bulk_create([
+        Paiement.frais_mensuels.through(paiement_id=paiement.id, fraismensuel_id=f.id)
+        for f in frais
+    ])
+    FraisMensuel.objects.filter(id__in=[f.id for f in frais]).update(est_paye=True)
+    transaction.on_commit(invalider_finances)
+
+    print(f"💰 Paiement {paiement.id} : {len(frais)} frais payés pour l'étudiant {etudiant_id}")
+    return paiement
@@ -0,0 +1,102 @@
+from django.db import transaction
+
+from .models import User, Classe
+from .moyennes import moyennes_generales
+
+# Taille des lots pour bulk_update (évite des CASE WHEN géants)
+TAILLE_LOT = 1000
+
+
+def classes_suivantes():
+    """
+    Construit une seule fois la table {classe_id: classe_suivante}.
+    La classe suivante est la première classe d'ordre strictement supérieur,
+    None pour la dernière classe.
+    """
+    classes = list(Classe.objects.order_by('ordre', 'id'))
+    suivantes = {}
+    for classe in classes:
+        suivantes[classe.id] = next((c for c in classes if c.ordre > classe.ordre), None)
+    return suivantes
+
+
+def planifier_promotion():
+    """
+    Calcule la décision de chaque étudiant actif sans rien écrire :
+    - 'promu' si moyenne >= 10 et qu'il existe une classe supérieure
+    - 'diplome' si moyenne >= 10 dans la dernière classe
+    - 'redoublant' sinon
+    Retourne (plan, erreurs).
+    """
+    etudiants = list(
+        User.objects.filter(role='etud', is_active=True)
+        .select_related('classe')
+        .order_by('id')
+    )
+    moyennes = moyennes_generales()
+    suivantes = classes_suivantes()
+
+    plan = []
+    erreurs = []
+    for etu in etudiants:
+        if not etu.classe:
+            erreurs.append(f"{etu.nom} {etu.prenom} n'a pas de classe assignée.")
+            continue
+
+        if etu.id not in moyennes:
+            erreurs.append(f"Aucune note trouvée pour {etu.nom} {etu.prenom}.")
+            continue
+
+        moyenne = moyennes[etu.id] or 0
+        next_classe = suivantes.get(etu.classe_id)
+
+        if moyenne >= 10 and next_classe:
+            decision = 'promu'
+        elif moyenne >= 10:
+            decision = 'diplome'
+        else:
+            decision = 'redoublant'
+
+        plan.append({
+            "etudiant": etu,
+            "moyenne": moyenne,
+            "decision": decision,
+            "classe_suivante": next_classe if decision == 'promu' else None,
+        })
+
+    return plan, erreurs
+
+
+def appliquer_promotion(plan):
+    """Applique le plan avec bulk_update dans une seule transaction."""
+    promus = []
+    diplomes = []
+    for ligne in plan:
+        etu = ligne["etudiant"]
+        if ligne["decision"] == 'promu':
+            etu.classe = ligne["classe_suivante"]
+            etu.annee = etu.annee + 1
+            promus.append(etu)
+        elif ligne["decision"] == 'diplome':
+            etu.role = 'diplome'
+            diplomes.append(etu)
+
+    with transaction.atomic():
+        User.objects.bulk_update(promus, ['classe', 'annee'], batch_size=TAILLE_LOT)
+        User.objects.bulk_update(diplomes, ['role'], batch_size=TAILLE_LOT)
+
+
+def resume_plan(plan):
+    """Représentation JSON du plan (mode dry-run)."""
+    return [
+        {
+            "etudiant_id": ligne["etudiant"].id,
+            "nom": ligne["etudiant"].nom,
+            "prenom": ligne["etudiant"].prenom,
+            "moyenne": round(ligne["moyenne"], 2),
+            "decision": ligne["decision"],
+            "classe_actuelle": ligne["etudiant"].classe.niveau,
+            "classe_suivante": ligne["classe_suivante"].niveau if ligne["classe_suivante"] else None,
+        }
+        for ligne in plan
+    ]
@@ -3,8 +3,11 @@ from datetime import datetime
 from rest_framework import serializers, generics
 from .models import User
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import Classe, Matiere, EmploiDuTemps, Salle, Paiement, FraisMensuel, FraisPaiement, Note, Evaluation, Tache, Evenement, Absence, Exercice, Unite, SalaireClasseMatiere, FraisMensuelProf, PaiementProf
+from .paie import periode, annee_scolaire_de, MoisInvalide
 
 from rest_framework import serializers
 from .models import User, Classe
@@ -196,6 +199,12 @@ class ProfNoteSerializer(serializers.ModelSerializer):
                   'evaluation', 'evaluation_nom', 'matiere_nom', 
                   'semestre', 'valeur', 'remarque']
         
+class NoteLigneSerializer(serializers.Serializer):
+    """Une ligne de saisie groupée (ou d'import) des notes d'une évaluation"""
+    etudiant = serializers.IntegerField()
+    valeur = serializers.FloatField(min_value=0, max_value=20)
+    remarque = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
 class AbsenceSerializer(serializers.ModelSerializer):
     personne_nom = serializers.CharField(source="personne.nom", read_only=True)
     personne_prenom = serializers.CharField(source="personne.prenom", read_only=True)
@@ -409,10 +418,33 @@ class SalaireClasseMatiereSerializer(serializers.ModelSerializer):
         fields = ['id', 'professeur', 'classe', 'matiere', 'montant',
                   'professeur_id', 'classe_id', 'matiere_id']
         
+class SalaireClasseMatierePlatSerializer(serializers.ModelSerializer):
+    """Vue compacte des tarifs (?vue=plate) : identifiants et libellés uniquement"""
+    professeur_nom = serializers.CharField(source='professeur.nom', read_only=True)
+    professeur_prenom = serializers.CharField(source='professeur.prenom', read_only=True)
+    classe_niveau = serializers.CharField(source='classe.niveau', read_only=True)
+    matiere_nom = serializers.CharField(source='matiere.nom', read_only=True)
+
+    class Meta:
+        model = SalaireClasseMatiere
+        fields = ['id', 'professeur_id', 'professeur_nom', 'professeur_prenom',
+                  'classe_id', 'classe_niveau', 'matiere_id', 'matiere_nom', 'montant']
+        read_only_fields = fields
+
 class FraisMensuelProfSerializer(serializers.ModelSerializer):
     class Meta:
         model = FraisMensuelProf
-        fields = ['id', 'mois', 'salaire']
+        fields = ['id', 'mois', 'annee_scolaire', 'salaire']
+        # Par défaut : l'année scolaire de la date du paiement
+        extra_kwargs = {'annee_scolaire': {'required': False}}
+
+    def validate(self, data):
+        if 'annee_scolaire' in data:
+            try:
+                periode(data['mois'], data['annee_scolaire'])
+            except MoisInvalide as e:
+                raise serializers.ValidationError({'annee_scolaire': str(e)})
+        return data
 
 class PaiementProfSerializer(serializers.ModelSerializer):
     frais_mensuels = FraisMensuelProfSerializer(many=True)
@@ -423,26 +455,57 @@ class PaiementProfSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         frais_data = validated_data.pop('frais_mensuels')
-        paiement = PaiementProf.objects.create(**validated_data)
-        for frais in frais_data:
-            FraisMensuelProf.objects.create(paiement=paiement, **frais)
+        with transaction.atomic():
+            paiement = PaiementProf.objects.create(**validated_data)
+            annee_scolaire = annee_scolaire_de(timezone.localtime(paiement.date_creation))
+            FraisMensuelProf.objects.bulk_create(
+                [FraisMensuelProf(paiement=paiement, **{'annee_scolaire': annee_scolaire, **frais}) for frais in frais_data]
+            )
         return paiement
 
     def update(self, instance, validated_data):
         frais_data = validated_data.pop('frais_mensuels', None)
 
-        # Mettre à jour les champs simples
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
-        # Mettre à jour les frais mensuels si fournis
-        if frais_data is not None:
-            # Supprimer les anciens frais
-            instance.frais_mensuels.all().delete()
-            # Créer les nouveaux frais
-            for frais in frais_data:
-                FraisMensuelProf.objects.create(paiement=instance, **frais)
+        with transaction.atomic():
+            # Mettre à jour les champs simples
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            # Mettre à jour les frais mensuels si fournis : diff par (année scolaire, mois),
+            # seules les lignes ajoutées, modifiées ou retirées sont touchées
+            if frais_data is not None:
+                annee_scolaire = annee_scolaire_de(timezone.localtime(instance.date_creation))
+                demandes = {
+                    (frais.get('annee_scolaire', annee_scolaire), frais['mois']): frais['salaire']
+                    for frais in frais_data
+                }
+                existants = {}
+                a_supprimer = []
+                for frais in FraisMensuelProf.objects.filter(paiement=instance).order_by('id'):
+                    cle = (frais.annee_scolaire, frais.mois)
+                    if cle in demandes and cle not in existants:
+                        existants[cle] = frais
+                    else:
+                        a_supprimer.append(frais.id)
+
+                modifies = []
+                for cle, frais in existants.items():
+                    if frais.salaire != demandes[cle]:
+                        frais.salaire = demandes[cle]
+                        modifies.append(frais)
+
+                if a_supprimer:
+                    FraisMensuelProf.objects.filter(id__in=a_supprimer).delete()
+                if modifies:
+                    FraisMensuelProf.objects.bulk_update(modifies, ['salaire'])
+                FraisMensuelProf.objects.bulk_create([
+                    FraisMensuelProf(paiement=instance, annee_scolaire=annee, mois=mois, salaire=salaire)
+                    for (annee, mois), salaire in demandes.items() if (annee, mois) not in existants
+                ])
+
+                # Le cache de prefetch éventuel ne reflète plus la base
+                getattr(instance, '_prefetched_objects_cache', {}).pop('frais_mensuels', None)
 
         return instance
 
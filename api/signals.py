@@ -0,0 +1,153 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Note, Evaluation, Matiere, MoyenneMatiere, FraisMensuel, Paiement, SalaireMensuel, PaiementProf
+from .bulletins import invalider_bulletins
+from .finances import invalider_finances
+from .moyennes import actualiser_moyennes, actualiser_semestres
+from .paie import invalider_gains
+
+
+# ---------------- Bulletins en cache ----------------
+@receiver([post_save, post_delete], sender=Note)
+def invalider_bulletin_note(sender, instance, **kwargs):
+    invalider_bulletins([instance.etudiant_id])
+
+
+@receiver([post_save, post_delete], sender=Evaluation)
+def invalider_bulletins_evaluation(sender, instance, **kwargs):
+    etudiants_ids = Note.objects.filter(evaluation_id=instance.id).values_list('etudiant_id', flat=True).distinct()
+    invalider_bulletins(list(etudiants_ids))
+
+
+# ---------------- Moyennes ----------------
+def _suppression_depuis(kwargs, modele):
+    """Vrai si la suppression a été lancée sur ce modèle (et non par une cascade)."""
+    origine = kwargs.get('origin')
+    return getattr(origine, 'model', type(origine)) is modele
+
+
+def _cle_note(etudiant_id, evaluation_id):
+    evaluation = Evaluation.objects.filter(id=evaluation_id).values_list('matiere_id', 'semestre').first()
+    if not evaluation:
+        return None
+    return (etudiant_id, *evaluation)
+
+
+@receiver(pre_save, sender=Note)
+def memoriser_cle_note(sender, instance, **kwargs):
+    # Une note peut changer d'étudiant ou d'évaluation : l'ancienne clé doit aussi être recalculée
+    instance._cle_moyenne_avant = None
+    if instance.pk:
+        ancienne = Note.objects.filter(pk=instance.pk).values_list('etudiant_id', 'evaluation_id').first()
+        if ancienne:
+            instance._cle_moyenne_avant = _cle_note(*ancienne)
+
+
+@receiver(post_save, sender=Note)
+def actualiser_moyennes_note(sender, instance, **kwargs):
+    cles = {
+        (instance.etudiant_id, instance.evaluation.matiere_id, instance.evaluation.semestre),
+        getattr(instance, '_cle_moyenne_avant', None)
+    }
+    actualiser_moyennes({cle for cle in cles if cle})
+
+
+@receiver(post_delete, sender=Note)
+def actualiser_moyennes_note_supprimee(sender, instance, **kwargs):
+    # Les cascades sont traitées une seule fois par le modèle d'origine
+    if not _suppression_depuis(kwargs, Note):
+        return
+    cle = _cle_note(instance.etudiant_id, instance.evaluation_id)
+    if cle:
+        actualiser_moyennes({cle})
+
+
+@receiver(pre_save, sender=Evaluation)
+def memoriser_cle_evaluation(sender, instance, **kwargs):
+    instance._matiere_semestre_avant = None
+    if instance.pk:
+        instance._matiere_semestre_avant = (
+            Evaluation.objects.filter(pk=instance.pk).values_list('matiere_id', 'semestre').first()
+        )
+
+
+@receiver(post_save, sender=Evaluation)
+def actualiser_moyennes_evaluation(sender, instance, created, **kwargs):
+    avant = getattr(instance, '_matiere_semestre_avant', None)
+    if created or not avant or avant == (instance.matiere_id, instance.semestre):
+        return
+    etudiants_ids = set(Note.objects.filter(evaluation_id=instance.id).values_list('etudiant_id', flat=True))
+    cles = set()
+    for etudiant_id in etudiants_ids:
+        cles.add((etudiant_id, *avant))
+        cles.add((etudiant_id, instance.matiere_id, instance.semestre))
+    actualiser_moyennes(cles)
+
+
+@receiver(pre_delete, sender=Evaluation)
+def memoriser_notes_evaluation(sender, instance, **kwargs):
+    instance._cles_moyennes = {
+        (etudiant_id, instance.matiere_id, instance.semestre)
+        for etudiant_id in Note.objects.filter(evaluation_id=instance.id).values_list('etudiant_id', flat=True)
+    }
+
+
+@receiver(post_delete, sender=Evaluation)
+def actualiser_moyennes_evaluation_supprimee(sender, instance, **kwargs):
+    if not _suppression_depuis(kwargs, Evaluation):
+        return
+    actualiser_moyennes(getattr(instance, '_cles_moyennes', set()))
+
+
+@receiver(pre_delete, sender=Matiere)
+def memoriser_semestres_matiere(sender, instance, **kwargs):
+    instance._semestres_moyennes = set(
+        MoyenneMatiere.objects.filter(matiere_id=instance.id).values_list('etudiant_id', 'semestre')
+    )
+
+
+@receiver(post_delete, sender=Matiere)
+def actualiser_semestres_matiere_supprimee(sender, instance, **kwargs):
+    # Les MoyenneMatiere sont supprimées en cascade, il reste les moyennes de semestre
+    actualiser_semestres(getattr(instance, '_semestres_moyennes', set()))
+
+
+# ---------------- Tableau de bord financier ----------------
+# Les écritures en masse (bulk_create, update) ne passent pas par ces signaux :
+# elles appellent invalider_finances() elles-mêmes.
+@receiver([post_save, post_delete], sender=FraisMensuel)
+@receiver([post_save, post_delete], sender=Paiement)
+def invalider_finances_ecriture(sender, **kwargs):
+    transaction.on_commit(invalider_finances)
+
+
+@receiver(m2m_changed, sender=Paiement.frais_mensuels.through)
+def invalider_finances_liens(sender, action, **kwargs):
+    if action.startswith('post_'):
+        transaction.on_commit(invalider_finances)
+
+
+# ---------------- Gains des professeurs ----------------
+# Les mois d'un PaiementProf (FraisMensuelProf) ne sont écrits que par
+# PaiementProfSerializer, qui enregistre toujours le paiement lui-même ;
+# enregistrer_paie() invalide de son côté après ses écritures en masse.
+@receiver(pre_save, sender=SalaireMensuel)
+@receiver(pre_save, sender=PaiementProf)
+def memoriser_professeur(sender, instance, **kwargs):
+    # Le paiement (ou le salaire) peut changer de professeur : l'ancien est aussi à invalider
+    instance._professeur_avant = None
+    if instance.pk:
+        instance._professeur_avant = (
+            sender.objects.filter(pk=instance.pk).values_list('professeur_id', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=SalaireMensuel)
+@receiver([post_save, post_delete], sender=PaiementProf)
+def invalider_gains_ecriture(sender, instance, **kwargs):
+    professeurs = {instance.professeur_id, getattr(instance, '_professeur_avant', None)}
+    transaction.on_commit(partial(invalider_gains, [p for p in professeurs if p]))
@@ -0,0 +1,74 @@
+import os
+import re
+import threading
+import time
+import traceback
+import uuid
+
+from django.conf import settings
+from django.db import connection
+
+# Les fichiers produits sont gardés un jour puis purgés au lancement suivant
+DUREE_CONSERVATION = 24 * 3600
+_ID_VALIDE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def _chemin(tache_id, extension):
+    return os.path.join(settings.TACHES_DIR, f"{tache_id}.{extension}")
+
+
+def _purger():
+    limite = time.time() - DUREE_CONSERVATION
+    for nom in os.listdir(settings.TACHES_DIR):
+        chemin = os.path.join(settings.TACHES_DIR, nom)
+        try:
+            if os.path.getmtime(chemin) < limite:
+                os.remove(chemin)
+        except OSError:
+            pass
+
+
+def _executer(fonction, tache_id, extension):
+    chemin = _chemin(tache_id, extension)
+    try:
+        fonction(chemin + ".part")
+        os.replace(chemin + ".part", chemin)
+    except Exception as e:
+        traceback.print_exc()
+        with open(chemin + ".erreur", "w") as fichier:
+            fichier.write(str(e))
+        if os.path.exists(chemin + ".part"):
+            os.remove(chemin + ".part")
+    finally:
+        # Connexion propre à ce thread
+        connection.close()
+
+
+def lancer_tache(fonction, extension):
+    """
+    Exécute fonction(chemin) dans un thread de fond et retourne l'identifiant de la tâche.
+    L'état est porté par les fichiers (.part, fichier final, .erreur) : n'importe quel
+    worker peut répondre au suivi, sans cache partagé.
+    """
+    os.makedirs(settings.TACHES_DIR, exist_ok=True)
+    _purger()
+    tache_id = uuid.uuid4().hex
+    # Le .part existe dès le lancement : la tâche est « en cours » immédiatement
+    open(_chemin(tache_id, extension) + ".part", "wb").close()
+    threading.Thread(target=_executer, args=(fonction, tache_id, extension), daemon=True).start()
+    return tache_id
+
+
+def etat_tache(tache_id, extension):
+    """('pret', chemin), ('en_cours', None), ('erreur', message) ou (None, None) si inconnue."""
+    if not tache_id or not _ID_VALIDE.match(tache_id):
+        return None, None
+    chemin = _chemin(tache_id, extension)
+    if os.path.exists(chemin):
+        return 'pret', chemin
+    if os.path.exists(chemin + ".erreur"):
+        with open(chemin + ".erreur") as fichier:
+            return 'erreur', fichier.read()
+    if os.path.exists(chemin + ".part"):
+        return 'en_cours', None
+    return None, None
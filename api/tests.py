@@ -1,3 +1,545 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    User, Classe, Matiere, Evaluation, Note, Unite, SalaireClasseMatiere, MoyenneMatiere, MoyenneSemestre,
+    FraisMensuel, Paiement, EvenementStripe, EmploiDuTemps, Absence, SalaireMensuel, FraisMensuelProf
+)
+from .moyennes import reconstruire_moyennes, moyennes_generales
+from .paie import calculer_paie, enregistrer_paie, gains, annee_scolaire_de
+from .paiements import recevoir_evenement, traiter_lot, delai_reessai, MAX_TENTATIVES
+from .serializers import PaiementProfSerializer
+
+
+class EtudiantsParMatiereTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.classe = Classe.objects.create(niveau="L1", ordre=1)
+        cls.prof = User.objects.create_user(email="prof@inata.org", nom="Prof", prenom="Test", role="prof")
+        cls.matiere = Matiere.objects.create(nom="Algorithmique", professeur=cls.prof, classe=cls.classe)
+
+    def creer_notes(self, nb_etudiants, nb_evaluations):
+        evaluations = [
+            Evaluation.objects.create(nom=f"Devoir {i}", matiere=self.matiere) for i in range(nb_evaluations)
+        ]
+        debut = User.objects.count()
+        for i in range(nb_etudiants):
+            etudiant = User.objects.create_user(
+                email=f"etudiant{debut + i}@inata.org", nom=f"Etudiant{i}", prenom="Test",
+                role="etud", classe=self.classe
+            )
+            for evaluation in evaluations:
+                Note.objects.create(etudiant=etudiant, evaluation=evaluation, valeur=12)
+
+    def get(self):
+        client = APIClient()
+        client.force_authenticate(self.prof)
+        return client.get(f"/api/professeur/notes/{self.matiere.id}/etudiants/")
+
+    def test_nombre_de_requetes_constant(self):
+        self.creer_notes(2, 2)
+        with self.assertNumQueries(3):
+            petit = self.get()
+
+        self.creer_notes(20, 3)
+        with self.assertNumQueries(3):
+            grand = self.get()
+
+        self.assertEqual(len(petit.data), 2)
+        self.assertEqual(len(grand.data), 22)
+
+    def test_format_reponse(self):
+        self.creer_notes(1, 2)
+        etudiant = self.get().data[0]
+        self.assertEqual(set(etudiant), {"id", "nom", "prenom", "notes"})
+        self.assertEqual(len(etudiant["notes"]), 2)
+        self.assertEqual(set(etudiant["notes"][0]["evaluation"]), {"id", "nom", "semestre"})
+
+
+class ImportNotesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.classe = Classe.objects.create(niveau="L1", ordre=1)
+        cls.prof = User.objects.create_user(email="prof@inata.org", nom="Prof", prenom="Test", role="prof")
+        cls.matiere = Matiere.objects.create(nom="Algorithmique", professeur=cls.prof, classe=cls.classe)
+        cls.evaluation = Evaluation.objects.create(nom="Devoir", matiere=cls.matiere)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.prof)
+
+    def test_import_puis_saisie_groupee(self):
+        etudiants = [
+            User.objects.create_user(
+                email=f"etudiant{i}@inata.org", nom=f"Etudiant{i}", prenom="Test", role="etud", classe=self.classe
+            )
+            for i in range(2)
+        ]
+        contenu = (
+            "etudiant;valeur;remarque\n"
+            f"{etudiants[0].id};12,5;Bien\n"
+            f"{etudiants[1].id};8;\n"
+        ).encode("utf-8")
+        reponse = self.client.post(
+            "/api/professeur/notes/import/",
+            {"evaluation": self.evaluation.id, "fichier": SimpleUploadedFile("notes.csv", contenu)}
+        )
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.data["enregistrees"], 2)
+        self.assertEqual(
+            dict(Note.objects.values_list("etudiant_id", "valeur")),
+            {etudiants[0].id: 12.5, etudiants[1].id: 8}
+        )
+        ids = set(Note.objects.values_list("id", flat=True))
+
+        # Nouvelle saisie de la même évaluation : mise à jour, pas de doublon
+        reponse = self.client.post(
+            "/api/professeur/notes/saisie-groupee/",
+            {"evaluation": self.evaluation.id, "notes": [
+                {"etudiant": etudiants[0].id, "valeur": 15, "remarque": "Très bien"},
+                {"etudiant": etudiants[1].id, "valeur": 9.25},
+            ]}, format="json"
+        )
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(set(Note.objects.values_list("id", flat=True)), ids)
+        self.assertEqual(
+            set(Note.objects.values_list("etudiant_id", "valeur", "remarque")),
+            {(etudiants[0].id, 15, "Très bien"), (etudiants[1].id, 9.25, None)}
+        )
+
+    def test_xlsx_corrompu(self):
+        for contenu in (b"pas un classeur", b"PK\x05\x06" + b"\x00" * 18):
+            with self.subTest(contenu=contenu):
+                fichier = SimpleUploadedFile("notes.xlsx", contenu)
+                reponse = self.client.post(
+                    "/api/professeur/notes/import/", {"evaluation": self.evaluation.id, "fichier": fichier}
+                )
+                self.assertEqual(reponse.status_code, 400)
+        self.assertFalse(Note.objects.exists())
+
+    def test_evaluation_non_numerique(self):
+        reponse = self.client.post(
+            "/api/professeur/notes/saisie-groupee/",
+            {"evaluation": "abc", "notes": [{"etudiant": 1, "valeur": 12}]}, format="json"
+        )
+        self.assertEqual(reponse.status_code, 400)
+
+        fichier = SimpleUploadedFile("notes.csv", b"etudiant,valeur\n1,12\n")
+        reponse = self.client.post("/api/professeur/notes/import/", {"evaluation": "abc", "fichier": fichier})
+        self.assertEqual(reponse.status_code, 400)
+
+
+class MoyennesIncrementalesTests(TestCase):
+    """Les moyennes tenues à jour par les signaux doivent égaler une reconstruction complète."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.classe = Classe.objects.create(niveau="L1", ordre=1)
+        cls.prof = User.objects.create_user(email="prof@inata.org", nom="Prof", prenom="Test", role="prof")
+        cls.algo = Matiere.objects.create(nom="Algorithmique", professeur=cls.prof, classe=cls.classe)
+        cls.reseaux = Matiere.objects.create(nom="Réseaux", professeur=cls.prof, classe=cls.classe)
+        cls.etudiants = [
+            User.objects.create_user(
+                email=f"etudiant{i}@inata.org", nom=f"Etudiant{i}", prenom="Test", role="etud", classe=cls.classe
+            )
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        self.devoir = Evaluation.objects.create(nom="Devoir", matiere=self.algo, semestre=1)
+        self.examen = Evaluation.objects.create(nom="Examen", matiere=self.algo, semestre=1, type="examen")
+        self.tp = Evaluation.objects.create(nom="TP", matiere=self.reseaux, semestre=2)
+        premier, second = self.etudiants
+        self.notes = [
+            Note.objects.create(etudiant=premier, evaluation=self.devoir, valeur=10),
+            Note.objects.create(etudiant=premier, evaluation=self.examen, valeur=16),
+            Note.objects.create(etudiant=premier, evaluation=self.tp, valeur=12),
+            Note.objects.create(etudiant=second, evaluation=self.devoir, valeur=8),
+        ]
+
+    def etat(self):
+        return (
+            sorted(MoyenneMatiere.objects.values_list('etudiant_id', 'matiere_id', 'semestre', 'somme', 'nombre', 'moyenne')),
+            sorted(MoyenneSemestre.objects.values_list('etudiant_id', 'semestre', 'somme', 'nombre', 'moyenne')),
+        )
+
+    def assertCommeReconstruction(self):
+        incremental = self.etat()
+        reconstruire_moyennes()
+        self.assertEqual(incremental, self.etat())
+
+    def test_creation(self):
+        premier, second = self.etudiants
+        self.assertEqual(
+            MoyenneMatiere.objects.get(etudiant=premier, matiere=self.algo, semestre=1).moyenne, 13
+        )
+        self.assertEqual(moyennes_generales(), {premier.id: 38 / 3, second.id: 8})
+        self.assertCommeReconstruction()
+
+    def test_modification_valeur(self):
+        note = self.notes[0]
+        note.valeur = 20
+        note.save()
+        self.assertCommeReconstruction()
+
+    def test_deplacement_vers_autre_evaluation_et_etudiant(self):
+        note = self.notes[1]
+        note.evaluation = self.tp
+        note.etudiant = self.etudiants[1]
+        note.save()
+        self.assertCommeReconstruction()
+
+    def test_deplacement_evaluation_vers_autre_matiere(self):
+        self.examen.matiere = self.reseaux
+        self.examen.semestre = 2
+        self.examen.save()
+        self.assertCommeReconstruction()
+
+    def test_suppression_note(self):
+        self.notes[3].delete()
+        self.assertFalse(MoyenneMatiere.objects.filter(etudiant=self.etudiants[1]).exists())
+        self.assertFalse(MoyenneSemestre.objects.filter(etudiant=self.etudiants[1]).exists())
+        self.assertCommeReconstruction()
+
+    def test_suppression_evaluation(self):
+        self.devoir.delete()
+        self.assertCommeReconstruction()
+
+
+class SalairesProfTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@inata.org", nom="Admin", prenom="Test", role="admin")
+        cls.unite = Unite.objects.create(nom="Informatique")
+
+    def creer_tarifs(self, nombre):
+        debut = User.objects.count()
+        for i in range(nombre):
+            classe = Classe.objects.create(niveau=f"Niveau {debut + i}", ordre=debut + i)
+            prof = User.objects.create_user(
+                email=f"prof{debut + i}@inata.org", nom=f"Prof{i}", prenom="Test", role="prof", classe=classe
+            )
+            matiere = Matiere.objects.create(nom=f"Matiere {i}", professeur=prof, classe=classe, unite=self.unite)
+            SalaireClasseMatiere.objects.create(professeur=prof, classe=classe, matiere=matiere, montant=10000)
+
+    def get(self, vue=None):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        return client.get("/api/salaires-prof/", {"vue": vue} if vue else {})
+
+    def test_nombre_de_requetes_constant(self):
+        for vue in (None, "plate"):
+            with self.subTest(vue=vue):
+                SalaireClasseMatiere.objects.all().delete()
+                self.creer_tarifs(2)
+                with self.assertNumQueries(1):
+                    petit = self.get(vue)
+
+                self.creer_tarifs(20)
+                with self.assertNumQueries(1):
+                    grand = self.get(vue)
+
+                self.assertEqual(len(petit.data), 2)
+                self.assertEqual(len(grand.data), 22)
+
+    def test_vue_plate(self):
+        self.creer_tarifs(1)
+        tarif = SalaireClasseMatiere.objects.get()
+        ligne = self.get("plate").data[0]
+        self.assertEqual(ligne, {
+            "id": tarif.id,
+            "professeur_id": tarif.professeur_id, "professeur_nom": "Prof0", "professeur_prenom": "Test",
+            "classe_id": tarif.classe_id, "classe_niveau": tarif.classe.niveau,
+            "matiere_id": tarif.matiere_id, "matiere_nom": "Matiere 0",
+            "montant": "10000.00",
+        })
+        self.assertEqual(set(self.get().data[0]["matiere"]), {
+            "id", "nom", "is_active", "professeur", "professeur_nom", "professeur_prenom",
+            "classe", "classe_niveau", "unite", "unite_nom"
+        })
+
+
+class BoiteWebhooksTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.classe = Classe.objects.create(niveau="L1", ordre=1)
+        cls.etudiant = User.objects.create_user(
+            email="etudiant@inata.org", nom="Etudiant", prenom="Test", role="etud", classe=cls.classe
+        )
+
+    def evenement(self, event_id, metadata):
+        return {
+            "id": event_id,
+            "type": "checkout.session.completed",
+            "data": {"object": {"id": f"cs_{event_id}", "metadata": metadata}},
+        }
+
+    def test_doublon_ignore_et_frais_payes(self):
+        frais = FraisMensuel.objects.create(
+            etudiant=self.etudiant, mois="Octobre", annee_scolaire="2025-2026", montant=15000
+        )
+        evenement = self.evenement("evt_1", {"etudiant_id": str(self.etudiant.id), "frais_ids": str(frais.id)})
+        recevoir_evenement(evenement)
+        recevoir_evenement(evenement)
+        self.assertEqual(EvenementStripe.objects.count(), 1)
+
+        self.assertEqual(traiter_lot(), {"traites": 1})
+        frais.refresh_from_db()
+        self.assertTrue(frais.est_paye)
+        self.assertEqual(Paiement.objects.get().montant_total, 15000)
+        self.assertEqual(EvenementStripe.objects.get().statut, "Traité")
+        # Déjà traité : rien de dû au lot suivant
+        self.assertEqual(traiter_lot(), {})
+
+    def test_metadata_invalides_abandonnees_aussitot(self):
+        recevoir_evenement(self.evenement("evt_2", {}))
+        self.assertEqual(traiter_lot(), {"abandonnes": 1})
+        evenement = EvenementStripe.objects.get()
+        self.assertEqual((evenement.statut, evenement.tentatives), ("Abandonné", 1))
+        self.assertTrue(evenement.erreur.startswith("MetadataInvalide"))
+
+    def test_reessais_avec_backoff_puis_abandon(self):
+        recevoir_evenement(self.evenement("evt_3", {}))
+        with mock.patch("api.paiements.traiter_evenement", side_effect=RuntimeError("base indisponible")):
+            for tentative in range(1, MAX_TENTATIVES):
+                avant = timezone.now()
+                self.assertEqual(traiter_lot(), {"reessais": 1})
+                evenement = EvenementStripe.objects.get()
+                self.assertEqual((evenement.statut, evenement.tentatives), ("En attente", tentative))
+                self.assertGreaterEqual(evenement.prochaine_tentative, avant + delai_reessai(tentative))
+                # Pas encore dû : le lot suivant ne le reprend pas
+                self.assertEqual(traiter_lot(), {})
+                EvenementStripe.objects.update(prochaine_tentative=timezone.now())
+
+            self.assertEqual(traiter_lot(), {"abandonnes": 1})
+        evenement = EvenementStripe.objects.get()
+        self.assertEqual((evenement.statut, evenement.tentatives), ("Abandonné", MAX_TENTATIVES))
+        self.assertEqual(evenement.erreur, "RuntimeError: base indisponible")
+
+    def test_delai_reessai_plafonne(self):
+        self.assertEqual(delai_reessai(1), timedelta(seconds=30))
+        self.assertEqual(delai_reessai(3), timedelta(minutes=2))
+        self.assertEqual(delai_reessai(20), timedelta(hours=1))
+
+
+class RapportImpayesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@inata.org", nom="Admin", prenom="Test", role="admin")
+        cls.classe = Classe.objects.create(niveau="L1", ordre=1)
+        cls.etudiant = User.objects.create_user(
+            email="etudiant@inata.org", nom="Etudiant", prenom="Test", role="etud", classe=cls.classe
+        )
+
+    def get(self, **params):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        return client.get("/api/admin/finances/impayes/", {"annee_scolaire": "2025-2026", **params})
+
+    def test_mois_hors_annee_scolaire(self):
+        for mois in ("Juillet", "Novembre", "Octobre"):
+            FraisMensuel.objects.create(etudiant=self.etudiant, mois=mois, annee_scolaire="2025-2026", montant=1000)
+        ligne = self.get().data["results"][0]
+        self.assertEqual(ligne["nb_mois_impayes"], 3)
+        self.assertEqual(ligne["mois_plus_ancien"], "Octobre")
+        self.assertEqual(ligne["mois_impayes"], ["Octobre", "Novembre"])
+
+    def test_classe_non_numerique(self):
+        self.assertEqual(self.get(classe="abc").status_code, 400)
+        self.assertEqual(self.get(classe=self.classe.id).status_code, 200)
+
+
+class PaiementsListeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@inata.org", nom="Admin", prenom="Test", role="admin")
+        cls.classe = Classe.objects.create(niveau="L1", ordre=1)
+
+    def test_filtre_classe(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get("/api/etudiant/paiements/", {"classe": "abc"}).status_code, 400)
+        self.assertEqual(client.get("/api/etudiant/paiements/", {"classe": self.classe.id}).status_code, 200)
+
+
+class MoteurPaieTests(TestCase):
+    """Mars 2026 : 5 lundis, 5 mardis, 4 mercredis."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@inata.org", nom="Admin", prenom="Test", role="admin")
+        cls.classe = Classe.objects.create(niveau="L1", ordre=1)
+        cls.prof = User.objects.create_user(email="prof@inata.org", nom="Prof", prenom="Test", role="prof")
+        cls.algo = Matiere.objects.create(nom="Algorithmique", professeur=cls.prof, classe=cls.classe)
+        cls.reseaux = Matiere.objects.create(nom="Réseaux", professeur=cls.prof, classe=cls.classe)
+        for matiere, montant in ((cls.algo, 1000), (cls.reseaux, 500)):
+            SalaireClasseMatiere.objects.create(
+                professeur=cls.prof, classe=cls.classe, matiere=matiere, montant=montant
+            )
+        for horaire, jour, matiere in (
+            ("08:00-09:00", "lundi", cls.algo),
+            ("09:00-10:00", "lundi", cls.algo),
+            ("08:00-09:00", "mercredi", cls.algo),
+            ("08:00-09:00", "mardi", cls.reseaux),
+        ):
+            EmploiDuTemps.objects.create(classe=cls.classe, horaire=horaire, jour=jour, matiere=matiere)
+
+    def absence(self, jour, justifiee=False):
+        absence = Absence.objects.create(personne=self.prof, justifiee=justifiee)
+        Absence.objects.filter(id=absence.id).update(date=jour)
+
+    def salaires(self):
+        return {
+            matiere_id: (montant, verrouille, est_paye)
+            for matiere_id, montant, verrouille, est_paye in SalaireMensuel.objects.filter(
+                annee_scolaire="2025-2026", mois="Mars"
+            ).values_list('matiere_id', 'montant', 'verrouille', 'est_paye')
+        }
+
+    def test_heures_fois_taux_moins_absences(self):
+        # Lundi sans justificatif : 2 heures d'algorithmique retenues ; le mercredi justifié ne compte pas
+        self.absence(date(2026, 3, 9))
+        self.absence(date(2026, 3, 11), justifiee=True)
+        lignes = {ligne["matiere_id"]: ligne for ligne in calculer_paie("2025-2026", ["Mars"])}
+        self.assertEqual(
+            (lignes[self.algo.id]["heures"], lignes[self.algo.id]["heures_absence"], lignes[self.algo.id]["montant"]),
+            (14, 2, 12000)
+        )
+        self.assertEqual(
+            (lignes[self.reseaux.id]["heures"], lignes[self.reseaux.id]["heures_absence"],
+             lignes[self.reseaux.id]["montant"]),
+            (5, 0, 2500)
+        )
+
+    def test_lignes_verrouillees_ou_payees_intactes(self):
+        self.assertEqual(enregistrer_paie("2025-2026", ["Mars"]), (2, 0, 0))
+        SalaireMensuel.objects.filter(matiere=self.algo).update(verrouille=True)
+        SalaireMensuel.objects.filter(matiere=self.reseaux).update(est_paye=True)
+        SalaireClasseMatiere.objects.update(montant=9999)
+
+        self.assertEqual(enregistrer_paie("2025-2026", ["Mars"]), (0, 2, 0))
+        self.assertEqual(self.salaires(), {
+            self.algo.id: (14000, True, False),
+            self.reseaux.id: (2500, False, True),
+        })
+
+    def test_lignes_sans_tarif_supprimees(self):
+        enregistrer_paie("2025-2026", ["Mars"])
+        SalaireClasseMatiere.objects.all().delete()
+        SalaireMensuel.objects.filter(matiere=self.reseaux).update(verrouille=True)
+
+        self.assertEqual(enregistrer_paie("2025-2026", ["Mars"]), (0, 0, 1))
+        self.assertEqual(self.salaires(), {self.reseaux.id: (2500, True, False)})
+
+    def test_parametres_invalides(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get("/api/admin/paie/", {"professeur": "abc"}).status_code, 400)
+        self.assertEqual(client.get("/api/admin/paie/fiches/", {"mois": "Mars", "professeur": "abc"}).status_code, 400)
+        self.assertEqual(
+            client.post("/api/admin/paie/verrouiller/", {"mois": "Mars", "verrouille": "peut-être"}).status_code, 400
+        )
+
+    def test_deverrouillage(self):
+        enregistrer_paie("2025-2026", ["Mars"])
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        for valeur, attendu in (("true", True), ("false", False)):
+            reponse = client.post(
+                "/api/admin/paie/verrouiller/", {"annee_scolaire": "2025-2026", "mois": "Mars", "verrouille": valeur}
+            )
+            self.assertEqual(reponse.data["lignes"], 2)
+            self.assertEqual({v for _, v, _ in self.salaires().values()}, {attendu})
+
+
+class GainsProfesseurTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="admin@inata.org", nom="Admin", prenom="Test", role="admin")
+        cls.classe = Classe.objects.create(niveau="L1", ordre=1)
+        cls.prof = User.objects.create_user(email="prof@inata.org", nom="Prof", prenom="Test", role="prof")
+        cls.matiere = Matiere.objects.create(nom="Algorithmique", professeur=cls.prof, classe=cls.classe)
+
+    def salaire(self, mois, annee_scolaire, montant):
+        return SalaireMensuel.objects.create(
+            professeur=self.prof, matiere=self.matiere, mois=mois, annee_scolaire=annee_scolaire, montant=montant
+        )
+
+    def payer(self, *frais):
+        serializer = PaiementProfSerializer(data={"montant_total": sum(f["salaire"] for f in frais), "frais_mensuels": list(frais)})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save(professeur=self.prof)
+
+    def resume(self):
+        resume = gains([self.prof.id])[self.prof.id]
+        return (resume["du"], resume["paye"], resume["reste"]), {
+            annee["annee_scolaire"]: (annee["du"], annee["paye"]) for annee in resume["annees"]
+        }
+
+    def test_paye_compte_dans_l_annee_du_salaire(self):
+        self.salaire("Juin", "2024-2025", 1000)
+        self.salaire("Mars", "2025-2026", 2000)
+        # Un même paiement règle un reliquat de l'année précédente et un mois de l'année en cours
+        self.payer(
+            {"mois": "Juin", "annee_scolaire": "2024-2025", "salaire": 600},
+            {"mois": "Mars", "annee_scolaire": "2025-2026", "salaire": 2000},
+        )
+        self.assertEqual(self.resume(), ((3000, 2600, 400), {"2025-2026": (2000, 2000), "2024-2025": (1000, 600)}))
+
+    def test_annee_scolaire_par_defaut(self):
+        paiement = self.payer({"mois": "Mars", "salaire": 100})
+        self.assertEqual(
+            FraisMensuelProf.objects.get(paiement=paiement).annee_scolaire,
+            annee_scolaire_de(timezone.localtime(paiement.date_creation))
+        )
+        serializer = PaiementProfSerializer(data={
+            "montant_total": 100, "frais_mensuels": [{"mois": "Mars", "annee_scolaire": "abc", "salaire": 100}]
+        })
+        self.assertFalse(serializer.is_valid())
+
+    def test_modification_par_annee_et_mois(self):
+        paiement = self.payer(
+            {"mois": "Juin", "annee_scolaire": "2024-2025", "salaire": 600},
+            {"mois": "Juin", "annee_scolaire": "2025-2026", "salaire": 900},
+        )
+        juin_precedent = FraisMensuelProf.objects.get(paiement=paiement, annee_scolaire="2024-2025")
+        serializer = PaiementProfSerializer(paiement, data={"montant_total": 1000, "frais_mensuels": [
+            {"mois": "Juin", "annee_scolaire": "2024-2025", "salaire": 1000},
+        ]})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(
+            list(FraisMensuelProf.objects.filter(paiement=paiement).values_list('id', 'annee_scolaire', 'salaire')),
+            [(juin_precedent.id, "2024-2025", 1000)]
+        )
+
+    def test_invalidation_au_commit(self):
+        self.assertEqual(self.resume()[0], (0, 0, 0))
+        # Tant que la transaction n'est pas validée, le résumé en cache reste servi
+        with self.captureOnCommitCallbacks(execute=False):
+            self.salaire("Mars", "2025-2026", 2000)
+        self.assertEqual(self.resume()[0], (0, 0, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salaire("Avril", "2025-2026", 1500)
+        self.assertEqual(self.resume()[0], (3500, 0, 3500))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payer({"mois": "Mars", "annee_scolaire": "2025-2026", "salaire": 2000})
+        self.assertEqual(self.resume()[0], (3500, 2000, 1500))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SalaireMensuel.objects.get(mois="Avril").delete()
+        self.assertEqual(self.resume()[0], (2000, 2000, 0))
 
-# Create your tests here.
+    def test_parametre_professeur(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get("/api/admin/paie/gains/", {"professeur": "abc"}).status_code, 400)
+        self.assertEqual(client.get("/api/admin/paie/gains/", {"professeur": self.admin.id}).status_code, 404)
+        self.assertEqual(client.get("/api/admin/paie/gains/", {"professeur": self.prof.id}).status_code, 200)
@@ -0,0 +1,9 @@
+from rest_framework.throttling import UserRateThrottle
+
+class VerificationPaiementThrottle(UserRateThrottle):
+    """Polling du statut d'un paiement (taux par utilisateur)"""
+    scope = 'verification_paiement'
+
+class SessionStripeThrottle(UserRateThrottle):
+    """Création de sessions Stripe (taux par utilisateur)"""
+    scope = 'session_stripe'
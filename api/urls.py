@@ -3,15 +3,15 @@ from rest_framework.routers import DefaultRouter
 from django.conf import settings
 from django.conf.urls.static import static
 from .views import (
-    utilisateur_connecte, UpdateProfilView,UpdatePhotoView, CreateStripeSessionView, stripe_webhook,
+    utilisateur_connecte, UpdateProfilView,UpdatePhotoView, CreateStripeSessionView, CheckPaymentStatusView, stripe_webhook, StripeInboxMetriquesView,
     UserListView, UpdateUserView, DeleteUserView, SecureRegisterView, GenerateInvitationLink,
     ClasseViewSet, MatiereViewSet, SalleViewSet, ProfesseurListView, EmploiDuTempsView, PaiementListCreateView,
-    ajouter_frais, frais_disponibles, FraisPaiementViewSet, FraisAdminListView, matieres_professeur, NoteViewSet,
+    ajouter_frais, generer_frais_mensuels, TableauFinancesView, RapportImpayesView, GrandLivreView, frais_disponibles, FraisPaiementViewSet, FraisAdminListView, matieres_professeur, NoteViewSet,
     EtudiantsParClasse, EvaluationViewSet, TacheViewSet, EvenementViewSet, AbsenceViewSet, AbsenceProfesseurViewSet,
     FraisPaiementDetailView, AdminPaiementCreateView, AdminEvaluationListView, AdminNoteListView,
     DevoirListCreateView, download_devoir, DevoirEtudiantView, MatiereEtudiantView, NotesEtudiantView, emploi_etudiant,
     etudiant_info, promotion_etudiants, UserDetailView, admin_notes_etudiants, BulletinView, DownloadBulletinView, 
-    DownloadBulletinsClasseView, UniteViewSet, SalaireClasseMatiereViewSet, debug_permissions, GetInvitationView
+    DownloadBulletinsClasseView, UniteViewSet, SalaireClasseMatiereViewSet, PaieView, verrouiller_paie_mois, FichesPaieView, GainsProfesseurView, debug_permissions, GetInvitationView
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -49,7 +49,9 @@ urlpatterns = [
     # Paiement
     path('etudiant/frais_disponibles/', frais_disponibles, name='frais_disponibles'),
     path('paiements/stripe-session/', CreateStripeSessionView.as_view(), name='stripe-session'),
+    path('paiements/statut/', CheckPaymentStatusView.as_view(), name='payment-status'),
     path('paiements/stripe-webhook/', stripe_webhook, name='stripe-webhook'),
+    path('paiements/stripe-webhook/metriques/', StripeInboxMetriquesView.as_view(), name='stripe-webhook-metriques'),
     path('etudiant/paiements/', PaiementListCreateView.as_view(), name='paiement-list-create'),
     path('etudiant/ajouter-frais/', ajouter_frais, name='ajouter_frais'),
     path('etudiant/emplois-du-temps/', emploi_etudiant, name='emploi_etudiant'),
@@ -68,6 +70,10 @@ urlpatterns = [
     path('admin/paiements/', FraisAdminListView.as_view(), name='paiement-list'),
     path('admin/paiements/ajouter/', AdminPaiementCreateView.as_view(), name='paiement-create'),
     path('admin/frais/', FraisAdminListView.as_view(), name='admin-frais'),
+    path('admin/frais/generer/', generer_frais_mensuels, name='admin-frais-generer'),
+    path('admin/finances/tableau/', TableauFinancesView.as_view(), name='admin-finances-tableau'),
+    path('admin/finances/impayes/', RapportImpayesView.as_view(), name='admin-finances-impayes'),
+    path('admin/finances/grand-livre/', GrandLivreView.as_view(), name='admin-finances-grand-livre'),
     path('admin/classes/<int:classe_id>/etudiants/', EtudiantsParClasse.as_view(), name='admin-etudiants-par-classe'),
     path('admin/frais-classe/<int:classe>/', FraisPaiementDetailView.as_view(), name='frais-classe-detail'),
     path('admin/evaluations/', AdminEvaluationListView.as_view(), name='admin-evaluations'),
@@ -77,12 +83,17 @@ urlpatterns = [
     path('admin/bulletins/', BulletinView.as_view(), name='admin-bulletins'),
     path('admin/bulletins/download/<int:etudiant_id>/', DownloadBulletinView.as_view(), name='download-bulletin'),
     path('admin/bulletins/download/class/<str:classe_niveau>/', DownloadBulletinsClasseView.as_view(), name='download-bulletins-classe'),
+    path('admin/paie/', PaieView.as_view(), name='admin-paie'),
+    path('admin/paie/verrouiller/', verrouiller_paie_mois, name='admin-paie-verrouiller'),
+    path('admin/paie/fiches/', FichesPaieView.as_view(), name='admin-paie-fiches'),
+    path('admin/paie/gains/', GainsProfesseurView.as_view(), name='admin-paie-gains'),
 
     # Professeur
     path('professeur/emplois-du-temps/', EmploiDuTempsView.as_view(), name='emploi-du-temps-prof'),
     path('professeur/matieres/', matieres_professeur, name='prof_matieres'),
     path('professeur/classes/<int:classe_id>/etudiants/', EtudiantsParClasse.as_view(), name='prof-etudiants-par-classe'),
     path('professeur/devoirs/', DevoirListCreateView.as_view(), name='professeur-devoirs'),
+    path('professeur/gains/', GainsProfesseurView.as_view(), name='professeur-gains'),
     path('professeur/telecharger/<str:filename>', download_devoir, name='download_devoir'),
 ]
 if settings.DEBUG:
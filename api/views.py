@@ -8,32 +8,26 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.contrib.auth import authenticate
 from django.utils.crypto import get_random_string
 from django.utils.decorators import method_decorator
+from django.utils.dateparse import parse_date
 from django.views.decorators.csrf import csrf_exempt
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from collections import defaultdict
 import stripe
 from django.conf import settings
 from django.http import FileResponse, Http404
 import os
 from collections import OrderedDict
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from django.http import HttpResponse
+from functools import partial
 from datetime import datetime
-import io, base64
-from django.db import models
-from django.db.models import Avg
+import io, base64, binascii, csv, json, zipfile
+from django.db import models, transaction, IntegrityError
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from .models import (
     User, InvitationLink, Classe, Matiere, EmploiDuTemps, Salle,
     Paiement, FraisMensuel, FraisPaiement, Note, Evaluation, Tache, 
-    Evenement, Absence, Exercice, Unite, SalaireClasseMatiere, PaiementProf
+    Evenement, Absence, Exercice, Unite, SalaireClasseMatiere, SalaireMensuel, PaiementProf,
+    annee_scolaire_courante
 )
 from .serializers import (
     UserSerializer, PaiementSerializer,
@@ -43,12 +37,53 @@ from .serializers import (
     NoteSerializer, ProfNoteSerializer, EvaluationSerializer, TacheSerializer, 
     EvenementSerializer, AbsenceSerializer, AbsenceProfesseurSerializer,
     PaiementManualSerializer, NoteAdminSerializer, ExerciceSerializer, 
-    UniteSerializer, SalaireClasseMatiereSerializer, PaiementProfSerializer
+    UniteSerializer, SalaireClasseMatiereSerializer, SalaireClasseMatierePlatSerializer, PaiementProfSerializer, NoteLigneSerializer
 )
 # Supprimez les imports en double et gardez seulement celui depuis le répertoire courant
 from .permissions import IsAdmin, IsAdminOrProf
+from .throttles import VerificationPaiementThrottle, SessionStripeThrottle
+from .paiements import (
+    recevoir_evenement, metriques_inbox, configurer_stripe, appel_stripe, StripeIndisponible,
+    statut_session_stripe, generer_frais
+)
+from .finances import (
+    tableau_de_bord, invalider_finances, impayes, ligne_impayes, COLONNES_IMPAYES,
+    grand_livre, ecrire_grand_livre_xlsx, COLONNES_GRAND_LIVRE
+)
+from .taches import lancer_tache, etat_tache
+from .paie import calculer_paie, enregistrer_paie, verrouiller_paie, periode, gains, MoisInvalide
+from .fiches_paie import ecrire_fiches_zip
+from .promotion import planifier_promotion, appliquer_promotion, resume_plan
+from .moyennes import actualiser_moyennes
+from .bulletins import (
+    payloads_etudiants, empreinte, bulletins_avec_cache, invalider_bulletins, nom_fichier, flux_zip, flux_pdf_fusionne
+)
+from .exports import TAILLE_LOT_EXPORT, reponse_export
 from rest_framework.exceptions import ValidationError
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from rest_framework.fields import BooleanField
+configurer_stripe()
+
+# ---------------- Pagination par curseur ----------------
+NOTES_PAGE_SIZE = 100
+NOTES_PAGE_SIZE_MAX = 1000
+
+def decoder_curseur(curseur, taille):
+    """Curseur opaque -> tuple d'entiers (None si absent). ValueError si invalide."""
+    if not curseur:
+        return None
+    try:
+        position = tuple(int(x) for x in base64.urlsafe_b64decode(curseur.encode()).decode().split(":"))
+    except (TypeError, UnicodeDecodeError, binascii.Error):
+        raise ValueError("curseur invalide")
+    if len(position) != taille:
+        raise ValueError("curseur invalide")
+    return position
+
+def url_curseur(request, position):
+    curseur = base64.urlsafe_b64encode(":".join(str(x) for x in position).encode()).decode()
+    params = request.GET.copy()
+    params["cursor"] = curseur
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
 
 # ---------------- Utilisateur connecté ----------------
 @api_view(['GET'])
@@ -160,49 +195,29 @@ def promotion_etudiants(request):
     - Passe en classe supérieure si moyenne >= 10
     - Marque 'Diplômé' s'ils sont dans la dernière classe
     - Sinon, ils redoublent
+    Avec dry_run=true, retourne le plan complet sans rien modifier.
     """
     try:
-        promus = 0
-        redoublants = 0
-        diplomes = 0
-        erreurs = []
-
-        etudiants = User.objects.filter(role='etud', is_active=True).select_related('classe')
-
-        for etu in etudiants:
-            if not etu.classe:
-                erreurs.append(f"{etu.nom} {etu.prenom} n'a pas de classe assignée.")
-                continue
+        dry_run = str(request.data.get("dry_run", request.query_params.get("dry_run", ""))).lower() in ("1", "true", "oui")
 
-            notes = Note.objects.filter(etudiant=etu)
+        plan, erreurs = planifier_promotion()
+        decisions = [ligne["decision"] for ligne in plan]
 
-            if not notes.exists():
-                erreurs.append(f"Aucune note trouvée pour {etu.nom} {etu.prenom}.")
-                continue
+        resultat = {
+            "promus": decisions.count('promu'),
+            "redoublants": decisions.count('redoublant'),
+            "diplomes": decisions.count('diplome'),
+            "erreurs": erreurs
+        }
 
-            moyenne = notes.aggregate(Avg('valeur'))['valeur__avg'] or 0
-            current_classe = etu.classe
-            next_classe = Classe.objects.filter(ordre__gt=current_classe.ordre).order_by('ordre').first()
-
-            if moyenne >= 10 and next_classe:
-                etu.classe = next_classe
-                etu.annee = etu.annee + 1
-                etu.save()
-                promus += 1
-            elif moyenne >= 10 and not next_classe:
-                etu.role = 'diplome'
-                etu.save()
-                diplomes += 1
-            else:
-                redoublants += 1
+        if dry_run:
+            resultat["message"] = "Simulation de la promotion (aucune modification)"
+            resultat["plan"] = resume_plan(plan)
+            return Response(resultat, status=status.HTTP_200_OK)
 
-        return Response({
-            "message": "Promotion terminée avec succès",
-            "promus": promus,
-            "redoublants": redoublants,
-            "diplomes": diplomes,
-            "erreurs": erreurs
-        }, status=status.HTTP_200_OK)
+        appliquer_promotion(plan)
+        resultat["message"] = "Promotion terminée avec succès"
+        return Response(resultat, status=status.HTTP_200_OK)
 
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -375,56 +390,26 @@ class EmploiDuTempsView(APIView):
 # ---------------- Webhook Stripe ----------------
 @csrf_exempt
 def stripe_webhook(request):
-    print("🔔 Webhook reçu ! Méthode :", request.method)
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
 
+    # Vérifie seulement la signature : le corps brut est mis en boîte de réception tel quel
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
+        stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
     except (ValueError, stripe.error.SignatureVerificationError):
         print("⚠ Échec de la vérification de signature")
         return HttpResponse(status=400)
 
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        print("⚡ Session checkout reçu :", session)
-        metadata = session.get('metadata', {})
-        print("📦 Metadata :", metadata)
-
-        etudiant_id = metadata.get("etudiant_id")
-        frais_ids = metadata.get("frais_ids", "")
-
-        if not etudiant_id or not frais_ids:
-            print("⚠ Metadata manquantes")
-            return HttpResponse(status=400)
-
-        etudiant_id = int(etudiant_id)
-        frais_ids = [int(m) for m in frais_ids.split(",")]
-
-        frais_objs = FraisMensuel.objects.filter(
-            id__in=frais_ids,
-            etudiant__id=etudiant_id,
-            est_paye=False
-        )
-
-        print("Frais trouvés:", list(frais_objs.values("id", "etudiant_id", "est_paye")))
-
-        if frais_objs.exists():
-            montant_total = sum(f.montant for f in frais_objs)
-            paiement = Paiement.objects.create(
-                etudiant_id=etudiant_id,
-                montant_total=montant_total,
-                stripe_session_id=session.get("id"),
-                statut="Payé",
-                mode_paiement="Stripe"
-            )
-            paiement.frais_mensuels.set(frais_objs)
-            frais_objs.update(est_paye=True)
+    # Accusé de réception immédiat : le traitement est fait par `manage.py traiter_webhooks`
+    recevoir_evenement(json.loads(payload))
+    return HttpResponse(status=200)
 
-            print("💰 Frais mis à jour :", list(frais_objs.values("id", "est_paye")))
+class StripeInboxMetriquesView(APIView):
+    permission_classes = [IsAuthenticated, IsAdmin]
 
-    return HttpResponse(status=200)
+    def get(self, request):
+        return Response(metriques_inbox())
 
 # ---------------- Frais ----------------
 class FraisPaiementViewSet(viewsets.ModelViewSet):
@@ -432,6 +417,35 @@ class FraisPaiementViewSet(viewsets.ModelViewSet):
     serializer_class = FraisPaiementSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def generer_frais_mensuels(request):
+    """
+    Génère les frais de tous les mois pour tous les étudiants actifs.
+    Corps optionnel : annee_scolaire, mois (liste), classe (id). Relançable sans doublon.
+    """
+    mois = request.data.get("mois")
+    if mois is not None and not isinstance(mois, list):
+        mois = [mois]
+    classe = request.data.get("classe")
+    classe_id = _entier(classe)
+    if classe not in (None, "") and classe_id is None:
+        return Response({"error": "classe doit être un identifiant numérique"}, status=400)
+
+    try:
+        crees, nb_etudiants = generer_frais(
+            annee_scolaire=request.data.get("annee_scolaire"),
+            mois=mois,
+            classe_id=classe_id
+        )
+    except MoisInvalide as e:
+        return Response({"error": str(e)}, status=400)
+    return Response({
+        "message": f"{crees} frais créés",
+        "frais_crees": crees,
+        "etudiants": nb_etudiants
+    }, status=201 if crees else 200)
+
 # ---------------- Paiements ----------------
 class PaiementCreateView(generics.CreateAPIView):
     queryset = Paiement.objects.all()
@@ -444,17 +458,49 @@ class PaiementCreateView(generics.CreateAPIView):
             return Paiement.objects.filter(etudiant=user)
         return Paiement.objects.all()
 
+class PaiementPagination(CursorPagination):
+    ordering = ('-date_creation', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
 class PaiementListCreateView(generics.ListCreateAPIView):
+    """
+    Paiements paginés par curseur (du plus récent au plus ancien).
+    Filtres : ?classe=<id>&mois=<mois>&statut=<statut>&mode=<mode_paiement>
+    """
     serializer_class = PaiementSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaiementPagination
 
     def get_queryset(self):
         user = self.request.user
         if user.role == 'etud':
-            return Paiement.objects.filter(etudiant=user)
+            paiements = Paiement.objects.filter(etudiant=user)
         elif user.role == 'admin':
-            return Paiement.objects.all()
-        return Paiement.objects.none()
+            paiements = Paiement.objects.all()
+        else:
+            return Paiement.objects.none()
+
+        params = self.request.query_params
+        if params.get('classe'):
+            classe_id = _entier(params['classe'])
+            if classe_id is None:
+                raise ValidationError({"error": "classe doit être un identifiant numérique"})
+            paiements = paiements.filter(etudiant__classe_id=classe_id)
+        if params.get('mois'):
+            # Un paiement couvre plusieurs mois : filtre par sous-requête, sans doublon
+            paiements = paiements.filter(
+                id__in=Paiement.frais_mensuels.through.objects
+                .filter(fraismensuel__mois=params['mois'])
+                .values('paiement_id')
+            )
+        if params.get('statut'):
+            paiements = paiements.filter(statut=params['statut'])
+        if params.get('mode'):
+            paiements = paiements.filter(mode_paiement__iexact=params['mode'])
+
+        return paiements.select_related('etudiant__classe').prefetch_related('frais_mensuels')
 
 # Vue pour récupérer les paiements de l'étudiant
 class PaiementsEtudiantView(APIView):
@@ -524,6 +570,7 @@ class PaiementsEtudiantView(APIView):
 class CreateStripeSessionView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [SessionStripeThrottle]
 
     def post(self, request):
         try:
@@ -534,17 +581,15 @@ class CreateStripeSessionView(APIView):
                 return Response({"error": "Veuillez sélectionner au moins un frais."},
                                 status=status.HTTP_400_BAD_REQUEST)
 
-            frais_objs_ordered = []
-            for frais_id in frais_ids:
-                try:
-                    f = FraisMensuel.objects.get(
-                        id=frais_id, 
-                        etudiant=etudiant, 
-                        est_paye=False
-                    )
-                    frais_objs_ordered.append(f)
-                except FraisMensuel.DoesNotExist:
-                    continue
+            try:
+                frais_ids = list(dict.fromkeys(int(i) for i in frais_ids))
+            except (TypeError, ValueError):
+                return Response({"error": "Identifiants de frais invalides."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            # Une seule requête, puis on garde l'ordre demandé
+            frais_par_id = FraisMensuel.objects.filter(etudiant=etudiant, est_paye=False).in_bulk(frais_ids)
+            frais_objs_ordered = [frais_par_id[i] for i in frais_ids if i in frais_par_id]
 
             if not frais_objs_ordered:
                 return Response({"error": "Aucun frais valide trouvé."},
@@ -568,7 +613,8 @@ class CreateStripeSessionView(APIView):
 
             frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
 
-            session = stripe.checkout.Session.create(
+            session = appel_stripe(
+                stripe.checkout.Session.create,
                 payment_method_types=["card"],
                 line_items=line_items,
                 mode="payment",
@@ -589,6 +635,13 @@ class CreateStripeSessionView(APIView):
                 "montant_total": montant_total
             }, status=status.HTTP_200_OK)
 
+        except StripeIndisponible as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={"Retry-After": str(int(e.reessayer_dans or settings.STRIPE_DISJONCTEUR_DELAI))})
+        except stripe.error.StripeError as e:
+            print(f"❌ Erreur Stripe: {str(e)}")
+            return Response({"error": "Le service de paiement ne répond pas, réessayez plus tard."},
+                            status=status.HTTP_502_BAD_GATEWAY)
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -598,6 +651,7 @@ class CreateStripeSessionView(APIView):
 class CheckPaymentStatusView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [VerificationPaiementThrottle]
 
     def get(self, request):
         session_id = request.query_params.get('session_id')
@@ -605,18 +659,18 @@ class CheckPaymentStatusView(APIView):
         if not session_id:
             return Response({"error": "session_id manquant"}, status=400)
         
-        try:
-            # 1. Vérifier d'abord dans votre base de données
-            paiement = Paiement.objects.get(
-                stripe_session_id=session_id,
-                etudiant=request.user
-            )
-            
+        # 1. Vérifier d'abord dans notre base de données
+        paiement = (
+            Paiement.objects.filter(stripe_session_id=session_id, etudiant=request.user)
+            .prefetch_related('frais_mensuels')
+            .first()
+        )
+        if paiement:
             return Response({
                 "status": "success",
                 "payment_status": paiement.statut,
                 "montant_total": paiement.montant_total,
-                "date_paiement": paiement.date_paiement,
+                "date_paiement": paiement.date_creation,
                 "mode_paiement": paiement.mode_paiement,
                 "frais_mensuels": [
                     {
@@ -626,56 +680,52 @@ class CheckPaymentStatusView(APIView):
                     } for frais in paiement.frais_mensuels.all()
                 ]
             })
-            
-        except Paiement.DoesNotExist:
-            # 2. Si non trouvé, vérifier auprès de Stripe directement
-            try:
-                stripe_session = stripe.checkout.Session.retrieve(session_id)
-                
-                # Vérifier si la session Stripe est payée
-                if stripe_session.payment_status == 'paid':
-                    # Le paiement est réussi sur Stripe, mais pas encore dans notre DB
-                    # Cela arrive souvent quand le webhook est en retard
-                    return Response({
-                        "status": "processing",
-                        "payment_status": "paid_on_stripe",
-                        "session_status": stripe_session.status,
-                        "stripe_payment_status": stripe_session.payment_status,
-                        "message": "Paiement confirmé par Stripe, traitement en cours..."
-                    })
-                    
-                elif stripe_session.payment_status == 'unpaid':
-                    return Response({
-                        "status": "failed",
-                        "payment_status": "unpaid",
-                        "session_status": stripe_session.status,
-                        "message": "Paiement non effectué"
-                    })
-                    
-                else:
-                    return Response({
-                        "status": "pending",
-                        "payment_status": stripe_session.payment_status,
-                        "session_status": stripe_session.status,
-                        "message": "Paiement en attente de confirmation"
-                    })
-                    
-            except stripe.error.StripeError as e:
-                # Erreur Stripe
-                print(f"❌ Erreur Stripe: {str(e)}")
-                return Response({
-                    "status": "error",
-                    "error": "Erreur de communication avec le service de paiement",
-                    "detail": str(e)
-                }, status=500)
-                
-            except Exception as e:
-                # Erreur générale
-                print(f"❌ Erreur: {str(e)}")
-                return Response({
-                    "status": "error",
-                    "error": "Erreur lors de la vérification"
-                }, status=500)
+
+        # 2. Sinon, statut de la session côté Stripe (en cache, un seul appel par session)
+        try:
+            session = statut_session_stripe(session_id)
+        except StripeIndisponible as e:
+            return Response({"status": "error", "error": str(e)}, status=503,
+                            headers={"Retry-After": str(int(e.reessayer_dans or settings.STRIPE_DISJONCTEUR_DELAI))})
+        except stripe.error.InvalidRequestError:
+            return Response({"status": "error", "error": "Session introuvable"}, status=404)
+        except stripe.error.StripeError as e:
+            print(f"❌ Erreur Stripe: {str(e)}")
+            return Response({
+                "status": "error",
+                "error": "Erreur de communication avec le service de paiement",
+                "detail": str(e)
+            }, status=502)
+
+        # La session doit appartenir à l'étudiant connecté
+        if session["etudiant_id"] != str(request.user.id):
+            return Response({"status": "error", "error": "Session introuvable"}, status=404)
+
+        if session["payment_status"] == 'paid':
+            # Le paiement est réussi sur Stripe, mais pas encore dans notre DB
+            # Cela arrive souvent quand le webhook est en retard
+            return Response({
+                "status": "processing",
+                "payment_status": "paid_on_stripe",
+                "session_status": session["status"],
+                "stripe_payment_status": session["payment_status"],
+                "message": "Paiement confirmé par Stripe, traitement en cours..."
+            })
+
+        if session["payment_status"] == 'unpaid':
+            return Response({
+                "status": "failed",
+                "payment_status": "unpaid",
+                "session_status": session["status"],
+                "message": "Paiement non effectué"
+            })
+
+        return Response({
+            "status": "pending",
+            "payment_status": session["payment_status"],
+            "session_status": session["status"],
+            "message": "Paiement en attente de confirmation"
+        })
             
 # Vue pour récupérer les frais disponibles
 class FraisDisponiblesView(APIView):
@@ -717,29 +767,24 @@ def ajouter_frais(request):
     except FraisPaiement.DoesNotExist:
         return Response({"error": "Aucun montant défini pour cette classe"}, status=400)
 
-    now = datetime.now()
-    annee_scolaire = f"{now.year}-{now.year + 1}"
-
-    frais_crees = []
-
-    for m in mois:
-        frais_existant = FraisMensuel.objects.filter(
-            etudiant=user, 
-            mois=m, 
-            annee_scolaire=annee_scolaire
-        ).first()
-        
-        if frais_existant:
-            frais_crees.append(frais_existant)
-        else:
-            frais = FraisMensuel.objects.create(
-                etudiant=user,
-                mois=m,
-                montant=montant,
-                est_paye=False,
-                annee_scolaire=annee_scolaire
-            )
-            frais_crees.append(frais)
+    annee_scolaire = annee_scolaire_courante()
+    mois = list(dict.fromkeys(mois))
+
+    # La contrainte unique (etudiant, mois, annee_scolaire) écarte les mois déjà créés,
+    # y compris lors de deux clics simultanés ; une seule lecture renvoie ensuite le tout
+    with transaction.atomic():
+        FraisMensuel.objects.bulk_create(
+            [
+                FraisMensuel(etudiant=user, mois=m, montant=montant, est_paye=False, annee_scolaire=annee_scolaire)
+                for m in mois
+            ],
+            ignore_conflicts=True
+        )
+        transaction.on_commit(invalider_finances)
+    frais_par_mois = {
+        f.mois: f for f in FraisMensuel.objects.filter(etudiant=user, mois__in=mois, annee_scolaire=annee_scolaire)
+    }
+    frais_crees = [frais_par_mois[m] for m in mois if m in frais_par_mois]
 
     return Response({
         "message": "Frais créés/récupérés avec succès",
@@ -759,260 +804,154 @@ class DownloadBulletinView(APIView):
 
     def get(self, request, etudiant_id):
         try:
-            etudiant = User.objects.get(id=etudiant_id, role='etud')
+            etudiant = User.objects.select_related('classe').get(id=etudiant_id, role='etud')
         except User.DoesNotExist:
             return Response({"error": "Étudiant non trouvé"}, status=404)
 
-        notes_examens_s2 = Note.objects.filter(
-            etudiant=etudiant,
-            evaluation__type='examen',
-            evaluation__semestre=2
-        ).select_related('evaluation__matiere__unite').order_by(
-            'evaluation__matiere__unite__nom', 'evaluation__matiere__nom'
-        )
+        payload = payloads_etudiants([etudiant], semestre=2)[0]
+        etag = f'"{empreinte(payload)}"'
 
-        unite_dict = {}
-        for note in notes_examens_s2:
-            unite_nom = note.evaluation.matiere.unite.nom if note.evaluation.matiere.unite else '-'
-            matiere_nom = note.evaluation.matiere.nom
-            note_valeur = note.valeur
-            unite_dict.setdefault(unite_nom, []).append((matiere_nom, note_valeur))
-
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(
-            buffer, pagesize=letter,
-            rightMargin=40, leftMargin=40,
-            topMargin=190, bottomMargin=60
-        )
-        elements = []
-
-        styles = getSampleStyleSheet()
-        nom_centre_style = ParagraphStyle(
-            'NomCentre', parent=styles['Normal'],
-            fontName='Times-Roman',
-            fontSize=12, spaceAfter=20,
-            alignment=1, textColor=colors.black
-        )
-        info_style = ParagraphStyle(
-            'Info', parent=styles['Normal'],
-            fontName='Times-Roman',
-            fontSize=11, spaceAfter=6
-        )
-
-        elements.append(Paragraph(f"<b>RELEVE DE NOTES</b>", nom_centre_style))
-        elements.append(Spacer(1, 10))
-
-        elements.append(Paragraph(f"<b>De : {etudiant.nom} {etudiant.prenom}</b>", nom_centre_style))
-        elements.append(Spacer(1, 5))
-        elements.append(Paragraph(f"<b>Filière :</b> Informatique", info_style))
-        elements.append(Paragraph(f"<b>Niveau :</b> {etudiant.classe.niveau if etudiant.classe else 'Non assigné'}", info_style))
-        elements.append(Paragraph(f"<b>Spécialité :</b> Web Master / Infographiste", info_style))
-        elements.append(Paragraph(f"<b>Année universitaire :</b> {datetime.now().year} - {datetime.now().year + 1}", info_style))
-        elements.append(Spacer(1, 30))
-
-        if unite_dict:
-            table_data = [['Unité d\'enseignement', 'Modules', 'Note Examen finale /20']]
-            span_indices = []
-
-            current_row = 1
-            for unite_nom, modules in unite_dict.items():
-                for i, (matiere_nom, note_valeur) in enumerate(modules):
-                    if i == 0:
-                        table_data.append([unite_nom, matiere_nom, f"{note_valeur:.2f}"])
-                    else:
-                        table_data.append(['', matiere_nom, f"{note_valeur:.2f}"])
-                if len(modules) > 1:
-                    span_indices.append((current_row, current_row + len(modules) - 1))
-                current_row += len(modules)
-
-            table = Table(table_data, colWidths=[2*inch, 3*inch, 2*inch])
-            style = TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Times-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('FONTNAME', (0, 1), (-1, -1), 'Times-Roman'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ])
-            for start, end in span_indices:
-                style.add('SPAN', (0, start), (0, end))
-            table.setStyle(style)
-            elements.append(table)
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponse(status=304)
         else:
-            elements.append(Paragraph("Aucune note d'examen disponible pour le semestre 2", styles['Normal']))
-
-        elements.append(Spacer(1, 40))
-        elements.append(Paragraph("Le Directeur", nom_centre_style))
-        elements.append(Spacer(1, 50))
-        elements.append(Paragraph("RANDRIAMAHARO Mamy", nom_centre_style))
+            _, pdf = next(bulletins_avec_cache([payload]))
+            response = HttpResponse(pdf, content_type='application/pdf')
+            response['Content-Disposition'] = f'attachment; filename="{nom_fichier(payload)}"'
 
-        
-        def header_footer(canvas, doc):
-            canvas.saveState()
-            
-            logo_gauche = os.path.join(settings.BASE_DIR, "api/assets/InataLogo.png")
-            logos_droite = [
-                os.path.join(settings.BASE_DIR, "api/assets/cisco.png"),
-                os.path.join(settings.BASE_DIR, "api/assets/pearson.png"),
-                os.path.join(settings.BASE_DIR, "api/assets/oracle.png")
-            ]
-            
-            logo_gauche_width, logo_gauche_height = 104, 104
-            y_logo_gauche = 680
-            if os.path.exists(logo_gauche):
-                canvas.drawImage(logo_gauche, 40, y_logo_gauche, width=logo_gauche_width, height=logo_gauche_height, mask=None)
-            
-            logo_droite_width, logo_droite_height = 60, 40
-            spacing = 5
-            total_height_droite = len(logos_droite) * logo_droite_height + (len(logos_droite)-1)*spacing
-            top_padding = -20
-            y_start_droite = y_logo_gauche + logo_gauche_height/2 + total_height_droite/2 + top_padding
-            for i, logo in enumerate(logos_droite):
-                if os.path.exists(logo):
-                    canvas.drawImage(logo, 470, y_start_droite - (i+1)*logo_droite_height - i*spacing, width=logo_droite_width, height=logo_droite_height, mask='auto')
-            
-            canvas.setFont('Helvetica-Bold', 14)
-            canvas.drawCentredString(300, 740, "Institut de Arts et des Technologies Avancées")
-            
-            canvas.setFont('Helvetica-Bold', 10)
-            canvas.drawCentredString(300, 720, "Etablissement d'Enseignement Superieur Privé")
-
-            canvas.setFont('Helvetica', 6)
-            canvas.drawCentredString(300, 710, "545/MENRS/SG/DGENRS du 17/09/04 35.052/2014-MESuprES du 24/11/14 - 10769/2015- MESuprES du 06/02/15")
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
-            canvas.setFont('Helvetica-Bold', 8)
-            canvas.drawCentredString(300, 700, "Informatique, Arts et Multimédia")
+# ---------------- Bulletins d'une classe ----------------
+class DownloadBulletinsClasseView(APIView):
+    """
+    Tous les bulletins d'une classe en un seul téléchargement :
+    - ?mode=zip (par défaut) : une archive avec un PDF par étudiant, streamée au fil du rendu
+    - ?mode=pdf : un seul PDF fusionné, rendu en entier avant l'envoi du premier octet
+    Le semestre se choisit avec ?semestre=1 ou 2 (2 par défaut).
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
 
-            canvas.setFont('Helvetica-Bold', 8)
-            canvas.drawCentredString(300, 690, "Formation Diplomante et Professionnalisante")
+    def get(self, request, classe_niveau):
+        classe = Classe.objects.filter(niveau=classe_niveau).first()
+        if not classe:
+            return Response({"error": "Classe non trouvée"}, status=404)
 
-            canvas.setStrokeColor(colors.black)
-            canvas.setLineWidth(1)
-            canvas.line(40, 630, 555, 630)
-            canvas.setStrokeColor(colors.black)
-            canvas.setLineWidth(1)
-            canvas.line(40, 628, 555, 628)
+        mode = request.query_params.get("mode", "zip")
+        if mode not in ("zip", "pdf"):
+            return Response({"error": "mode doit valoir 'zip' ou 'pdf'"}, status=400)
 
-            footer_y = 130
-            canvas.setStrokeColor(colors.black)
-            canvas.setLineWidth(1)
-            canvas.line(40, footer_y, 555, footer_y)
+        try:
+            semestre = int(request.query_params.get("semestre", 2))
+        except ValueError:
+            semestre = None
+        if semestre not in dict(Evaluation.SEMESTRES):
+            return Response({"error": "semestre doit valoir 1 ou 2"}, status=400)
+
+        etudiants = User.objects.filter(classe=classe, role='etud').select_related('classe').order_by('nom', 'prenom')
+        payloads = payloads_etudiants(etudiants, semestre=semestre)
+        if not payloads:
+            return Response({"error": "Aucun étudiant dans cette classe"}, status=404)
+
+        nom_base = f"bulletins_s{semestre}_{classe.niveau}"
+        if mode == "pdf":
+            response = StreamingHttpResponse(flux_pdf_fusionne(payloads), content_type='application/pdf')
+            response['Content-Disposition'] = f'attachment; filename="{nom_base}.pdf"'
+            return response
+
+        fichiers = (
+            (f"{payload['etudiant_id']}_{nom_fichier(payload)}", pdf)
+            for payload, (_, pdf) in zip(payloads, bulletins_avec_cache(payloads))
+        )
+        response = StreamingHttpResponse(flux_zip(fichiers), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{nom_base}.zip"'
+        return response
+    
+class TableauFinancesView(APIView):
+    """Facturé / encaissé d'une année scolaire, par classe, par mois et par mode de paiement."""
+    permission_classes = [IsAuthenticated, IsAdmin]
 
-            canvas.setFont('Helvetica-Bold', 10)
-            canvas.drawCentredString(300, footer_y - 18, "Institut de Arts et des Technologies Avancées (InATA)")
-            canvas.setFont('Helvetica', 8)
-            canvas.drawCentredString(300, footer_y - 30, "Face Fokontany II L Ankadivato - 101 Antananarivo - Madagascar")
-            canvas.setFont('Helvetica', 8)
-            canvas.drawCentredString(300, footer_y - 42, "Tel : +261 20 24 244 34 / +261 32 07 260 00 / +261 33 07 260 00 / +261 34 07 260 00 - Email : inata@inata.org")
+    def get(self, request):
+        annee_scolaire = request.query_params.get('annee_scolaire') or annee_scolaire_courante()
+        return Response(tableau_de_bord(annee_scolaire))
 
-            canvas.restoreState()
+class GrandLivreView(APIView):
+    """
+    Grand livre des paiements pour la comptabilité : ?du=AAAA-MM-JJ&au=AAAA-MM-JJ
+    ?export=csv (défaut) : streamé directement.
+    ?export=xlsx : généré en tâche de fond (202), puis ?tache=<id> pour le suivre et le télécharger.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
 
-        doc.build(elements, onFirstPage=header_footer, onLaterPages=header_footer)
+    def get(self, request):
+        tache_id = request.query_params.get('tache')
+        if tache_id:
+            statut_tache, valeur = etat_tache(tache_id, 'xlsx')
+            if statut_tache == 'pret':
+                return FileResponse(open(valeur, 'rb'), as_attachment=True, filename="grand_livre.xlsx")
+            if statut_tache == 'en_cours':
+                return Response({"tache": tache_id, "statut": "en_cours"}, status=202)
+            if statut_tache == 'erreur':
+                return Response({"tache": tache_id, "statut": "erreur", "error": valeur}, status=500)
+            return Response({"error": "Tâche introuvable"}, status=404)
+
+        dates = {}
+        for cle in ('du', 'au'):
+            valeur = request.query_params.get(cle)
+            try:
+                dates[cle] = parse_date(valeur) if valeur else None
+            except ValueError:
+                dates[cle] = None
+            if valeur and dates[cle] is None:
+                return Response({"error": f"Date '{cle}' invalide (format AAAA-MM-JJ)"}, status=400)
+        du, au = dates['du'], dates['au']
+
+        export = request.query_params.get('export', 'csv')
+        if export == 'csv':
+            return reponse_export('csv', f"grand_livre_{du or 'debut'}_{au or 'fin'}", COLONNES_GRAND_LIVRE, grand_livre(du, au))
+        if export != 'xlsx':
+            return Response({"error": "export doit valoir 'csv' ou 'xlsx'"}, status=400)
+
+        tache_id = lancer_tache(partial(ecrire_grand_livre_xlsx, du=du, au=au), 'xlsx')
+        return Response({
+            "tache": tache_id,
+            "statut": "en_cours",
+            "url": request.build_absolute_uri(f"{request.path}?tache={tache_id}")
+        }, status=202)
 
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="bulletin_s2_{etudiant.nom}_{etudiant.prenom}.pdf"'
-        return response
+class ImpayesPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
 
-# ---------------- Bulletins d'une classe ----------------
-class DownloadBulletinsClasseView(APIView):
+class RapportImpayesView(APIView):
+    """
+    Étudiants ayant des mois impayés (?annee_scolaire=, ?classe=), paginé.
+    ?export=csv : rapport complet streamé pour la caisse.
+    """
     permission_classes = [IsAuthenticated, IsAdmin]
 
-    def get(self, request, etudiant_id):
-        try:
-            etudiant = User.objects.get(id=etudiant_id, role='etud')
-        except User.DoesNotExist:
-            return Response({"error": "Étudiant non trouvé"}, status=404)
+    def get(self, request):
+        annee_scolaire = request.query_params.get('annee_scolaire') or annee_scolaire_courante()
+        classe = request.query_params.get('classe')
+        classe_id = _entier(classe)
+        if classe not in (None, "") and classe_id is None:
+            return Response({"error": "classe doit être un identifiant numérique"}, status=400)
+        lignes = impayes(annee_scolaire, classe_id)
+
+        if request.query_params.get('export') == 'csv':
+            rapport = (
+                (*valeurs[:-1], ", ".join(valeurs[-1]))
+                for valeurs in map(ligne_impayes, lignes.iterator(chunk_size=TAILLE_LOT_EXPORT))
+            )
+            return reponse_export('csv', f"impayes_{annee_scolaire}", COLONNES_IMPAYES, rapport)
 
-        notes_examens_s2 = Note.objects.filter(
-            etudiant=etudiant,
-            evaluation__type='examen',
-            evaluation__semestre=2
-        ).select_related('evaluation__matiere__unite').order_by(
-            'evaluation__matiere__unite__id',
-            'evaluation__matiere__nom'
+        paginator = ImpayesPagination()
+        page = paginator.paginate_queryset(lignes, request, view=self)
+        return paginator.get_paginated_response(
+            [dict(zip(COLONNES_IMPAYES, ligne_impayes(ligne))) for ligne in page]
         )
 
-        unite_dict = OrderedDict()
-        for note in notes_examens_s2:
-            unite = note.evaluation.matiere.unite
-            unite_nom = unite.nom if unite else '-'
-            matiere_nom = note.evaluation.matiere.nom
-            note_valeur = note.valeur
-
-            if unite_nom not in unite_dict:
-                unite_dict[unite_nom] = []
-            unite_dict[unite_nom].append((matiere_nom, note_valeur))
-
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=16, spaceAfter=30, alignment=1)
-        nom_centre_style = ParagraphStyle('NomCentre', parent=styles['Normal'], fontSize=12, spaceAfter=20, alignment=1, textColor=colors.black)
-        info_style = ParagraphStyle('Info', parent=styles['Normal'], fontSize=11, spaceAfter=6)
-
-        elements.append(Paragraph("RELEVÉ DE NOTES", title_style))
-        elements.append(Spacer(1, 10))
-        elements.append(Paragraph(f"<b>De : {etudiant.nom} {etudiant.prenom} </b>", nom_centre_style))
-        elements.append(Spacer(1, 20))
-        elements.append(Paragraph(f"<b>Filière :</b> Informatique", info_style))
-        elements.append(Paragraph(f"<b>Niveau :</b> {etudiant.classe.niveau if etudiant.classe else 'Non assigné'}", info_style))
-        elements.append(Paragraph(f"<b>Spécialité :</b> Web Master / Infographiste", info_style))
-        elements.append(Paragraph(f"<b>Année universitaire :</b> {datetime.now().year} - {datetime.now().year + 1}", info_style))
-        elements.append(Spacer(1, 30))
-
-        if unite_dict:
-            table_data = [['Unité d\'enseignement', 'Modules', 'Note Examen finale /20']]
-            span_indices = []
-
-            current_row = 1
-            for unite_nom, modules in unite_dict.items():
-                for i, module in enumerate(modules):
-                    if i == 0:
-                        table_data.append([unite_nom, module[0], f"{module[1]:.2f}"])
-                    else:
-                        table_data.append(['', module[0], f"{module[1]:.2f}"])
-                if len(modules) > 1:
-                    span_indices.append((current_row, current_row + len(modules) - 1))
-                current_row += len(modules)
-
-            table = Table(table_data, colWidths=[2*inch, 3*inch, 2*inch])
-            style = TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ])
-            for start, end in span_indices:
-                style.add('SPAN', (0, start), (0, end))
-
-            table.setStyle(style)
-            elements.append(table)
-        else:
-            elements.append(Paragraph("Aucune note d'examen disponible pour le semestre 2", styles['Normal']))
-
-        elements.append(Spacer(1, 40))
-        elements.append(Paragraph("Le Directeur", nom_centre_style))
-        elements.append(Spacer(1, 50))
-        elements.append(Paragraph("RANDRIAMAHARO Mamy", nom_centre_style))
-        date_style = ParagraphStyle('Date', parent=styles['Normal'], fontSize=9, alignment=2)
-        elements.append(Spacer(1, 10))
-        elements.append(Paragraph(f"Éditée le {datetime.now().strftime('%d/%m/%Y')}", date_style))
-
-        doc.build(elements)
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="bulletin_s2_{etudiant.nom}_{etudiant.prenom}.pdf"'
-        return response
-    
 class FraisAdminListView(generics.ListAPIView):
     serializer_class = FraisMensuelAdminSerializer
     permission_classes = [IsAuthenticated, IsAdmin]  # Ajout de IsAdmin
@@ -1075,6 +1014,50 @@ class EvaluationViewSet(viewsets.ModelViewSet):
         
         return qs
 
+def lire_lignes_csv(fichier):
+    """Retourne [(numéro de ligne, {colonne: valeur})] d'un CSV (séparateur , ou ;)."""
+    contenu = fichier.read().decode('utf-8-sig')
+    dialecte = csv.Sniffer().sniff(contenu[:2048], delimiters=",;")
+    lecteur = csv.DictReader(io.StringIO(contenu), dialect=dialecte)
+    lignes = []
+    for numero, ligne in enumerate(lecteur, start=2):
+        donnees = {cle.strip().lower(): (valeur or '').strip() for cle, valeur in ligne.items() if cle}
+        if not any(donnees.values()):
+            continue
+        # Virgule décimale des tableurs français
+        if 'valeur' in donnees:
+            donnees['valeur'] = donnees['valeur'].replace(',', '.')
+        lignes.append((numero, donnees))
+    return lignes
+
+def _entier(valeur):
+    """Identifiant reçu dans la requête -> int, None s'il est absent ou non numérique."""
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        return None
+
+def lire_lignes_xlsx(fichier):
+    """Même format que lire_lignes_csv, à partir de la première feuille d'un classeur XLSX."""
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        classeur = load_workbook(fichier, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        # Fichier corrompu, ou archive ZIP qui n'est pas un classeur
+        raise ValueError("classeur XLSX invalide")
+    try:
+        lignes = classeur.worksheets[0].iter_rows(values_only=True)
+        entetes = [str(c).strip().lower() if c is not None else '' for c in next(lignes, [])]
+        return [
+            (numero, {cle: valeur for cle, valeur in zip(entetes, ligne) if cle and valeur is not None})
+            for numero, ligne in enumerate(lignes, start=2)
+            if any(valeur is not None for valeur in ligne)
+        ]
+    finally:
+        classeur.close()
+
 class NoteViewSet(viewsets.ModelViewSet):
     queryset = Note.objects.all()
     serializer_class = ProfNoteSerializer
@@ -1091,34 +1074,205 @@ class NoteViewSet(viewsets.ModelViewSet):
         except Matiere.DoesNotExist:
             return Response({"error": "Matière non trouvée"}, status=404)
 
-        etudiants = User.objects.filter(classe=matiere.classe, role="etud")
-        notes = Note.objects.filter(evaluation__matiere=matiere)
+        etudiants = User.objects.filter(classe_id=matiere.classe_id, role="etud")
+        notes = Note.objects.filter(evaluation__matiere=matiere).select_related('evaluation').order_by('id')
+
+        notes_par_etudiant = defaultdict(list)
+        for note in notes:
+            notes_par_etudiant[note.etudiant_id].append({
+                "id": note.id,
+                "valeur": note.valeur,
+                "remarque": note.remarque,
+                "evaluation": {
+                    "id": note.evaluation.id,
+                    "nom": note.evaluation.nom,
+                    "semestre": note.evaluation.semestre
+                }
+            })
 
         data = []
         for etudiant in etudiants:
-            notes_etudiant = notes.filter(etudiant=etudiant)
-            notes_list = []
-            for note in notes_etudiant:
-                notes_list.append({
-                    "id": note.id,
-                    "valeur": note.valeur,
-                    "remarque": note.remarque,
-                    "evaluation": {
-                        "id": note.evaluation.id,
-                        "nom": note.evaluation.nom,
-                        "semestre": note.evaluation.semestre
-                    }
-                })
-
             data.append({
                 "id": etudiant.id,
                 "nom": etudiant.nom,
                 "prenom": etudiant.prenom,
-                "notes": notes_list
+                "notes": notes_par_etudiant.get(etudiant.id, [])
             })
 
         return Response(data)
 
+    def _evaluation_modifiable(self, request, evaluation_id):
+        evaluations = Evaluation.objects.select_related('matiere')
+        if not IsAdmin().has_permission(request, self):
+            evaluations = evaluations.filter(matiere__professeur=request.user)
+        return evaluations.filter(id=evaluation_id).first()
+
+    def _enregistrer_notes(self, request, evaluation_id, lignes):
+        """
+        Valide toutes les lignes puis insère/met à jour les notes de
+        l'évaluation en une seule requête. Rien n'est écrit si une ligne est
+        invalide ; le rapport détaille le statut de chaque ligne.
+        """
+        evaluation = self._evaluation_modifiable(request, evaluation_id)
+        if not evaluation:
+            return Response({"error": "Évaluation non trouvée"}, status=404)
+
+        etudiants_classe = set(
+            User.objects.filter(classe_id=evaluation.matiere.classe_id, role='etud').values_list('id', flat=True)
+        )
+
+        rapport = []
+        notes = []
+        deja_vus = set()
+        for numero, donnees in lignes:
+            serializer = NoteLigneSerializer(data=donnees)
+            if not serializer.is_valid():
+                rapport.append({"ligne": numero, "etudiant": donnees.get("etudiant"), "statut": "erreur", "erreurs": serializer.errors})
+                continue
+
+            etudiant_id = serializer.validated_data["etudiant"]
+            if etudiant_id not in etudiants_classe:
+                erreurs = {"etudiant": ["Étudiant inconnu dans la classe de cette matière."]}
+            elif etudiant_id in deja_vus:
+                erreurs = {"etudiant": ["Étudiant présent plusieurs fois."]}
+            else:
+                erreurs = None
+
+            if erreurs:
+                rapport.append({"ligne": numero, "etudiant": etudiant_id, "statut": "erreur", "erreurs": erreurs})
+                continue
+
+            deja_vus.add(etudiant_id)
+            notes.append(Note(
+                etudiant_id=etudiant_id,
+                evaluation=evaluation,
+                valeur=serializer.validated_data["valeur"],
+                remarque=serializer.validated_data.get("remarque")
+            ))
+            rapport.append({"ligne": numero, "etudiant": etudiant_id, "statut": "ok"})
+
+        if len(notes) != len(rapport):
+            return Response({
+                "error": "Certaines lignes sont invalides, aucune note n'a été enregistrée",
+                "evaluation": evaluation.id,
+                "rapport": rapport
+            }, status=400)
+
+        with transaction.atomic():
+            Note.objects.bulk_create(
+                notes,
+                update_conflicts=True,
+                unique_fields=['etudiant', 'evaluation'],
+                update_fields=['valeur', 'remarque']
+            )
+            # bulk_create n'envoie pas de signaux : moyennes et bulletins sont mis à jour à la main
+            actualiser_moyennes({
+                (note.etudiant_id, evaluation.matiere_id, evaluation.semestre) for note in notes
+            })
+        invalider_bulletins([note.etudiant_id for note in notes])
+
+        return Response({
+            "message": f"{len(notes)} notes enregistrées",
+            "evaluation": evaluation.id,
+            "enregistrees": len(notes),
+            "rapport": rapport
+        }, status=200)
+
+    @action(detail=False, methods=['post'], url_path='saisie-groupee')
+    def saisie_groupee(self, request):
+        """
+        Enregistre toutes les notes d'une évaluation en une requête :
+        {"evaluation": id, "notes": [{"etudiant": id, "valeur": 12.5, "remarque": ""}, ...]}
+        """
+        evaluation_id = _entier(request.data.get("evaluation"))
+        notes = request.data.get("notes")
+        if not evaluation_id or not isinstance(notes, list) or not notes:
+            return Response({"error": "evaluation (identifiant) et notes (liste non vide) sont obligatoires"}, status=400)
+
+        lignes = [(i, ligne if isinstance(ligne, dict) else {}) for i, ligne in enumerate(notes, start=1)]
+        return self._enregistrer_notes(request, evaluation_id, lignes)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def importer(self, request):
+        """
+        Import CSV ou XLSX des notes d'une évaluation (champ 'fichier').
+        Colonnes attendues : etudiant, valeur, remarque (facultative).
+        """
+        evaluation_id = _entier(request.data.get("evaluation"))
+        fichier = request.FILES.get("fichier")
+        if not evaluation_id or not fichier:
+            return Response({"error": "evaluation (identifiant) et fichier sont obligatoires"}, status=400)
+
+        try:
+            if fichier.name.lower().endswith(".xlsx"):
+                lignes = lire_lignes_xlsx(fichier)
+            else:
+                lignes = lire_lignes_csv(fichier)
+        except ImportError:
+            return Response({"error": "Le format XLSX nécessite openpyxl sur le serveur"}, status=400)
+        except (UnicodeDecodeError, csv.Error, ValueError) as e:
+            return Response({"error": f"Fichier illisible : {e}"}, status=400)
+
+        if not lignes:
+            return Response({"error": "Le fichier ne contient aucune note"}, status=400)
+        return self._enregistrer_notes(request, evaluation_id, lignes)
+
+    @action(detail=True, methods=['get'], url_path='matrice')
+    def matrice(self, request, pk=None):
+        """
+        Grille étudiants x évaluations d'une matière (?semestre= optionnel) :
+        les étudiants et les évaluations une seule fois, puis les valeurs en
+        tableau dense ligne par ligne (null si la note manque).
+        """
+        matieres = Matiere.objects.all()
+        if not IsAdmin().has_permission(request, self):
+            matieres = matieres.filter(professeur=request.user)
+        try:
+            matiere = matieres.get(id=pk)
+        except Matiere.DoesNotExist:
+            return Response({"error": "Matière non trouvée"}, status=404)
+
+        evaluations = Evaluation.objects.filter(matiere=matiere).order_by('semestre', 'date', 'id')
+        notes = Note.objects.filter(evaluation__matiere=matiere)
+        semestre = request.query_params.get("semestre")
+        if semestre:
+            if semestre not in ("1", "2"):
+                return Response({"error": "semestre doit valoir 1 ou 2"}, status=400)
+            evaluations = evaluations.filter(semestre=semestre)
+            notes = notes.filter(evaluation__semestre=semestre)
+
+        etudiants = list(
+            User.objects.filter(classe_id=matiere.classe_id, role="etud")
+            .order_by('nom', 'prenom', 'id')
+            .values_list('id', 'nom', 'prenom')
+        )
+        evaluations = list(evaluations.values_list('id', 'nom', 'semestre', 'type'))
+
+        ligne = {etudiant_id: i for i, (etudiant_id, _, _) in enumerate(etudiants)}
+        colonne = {evaluation_id: j for j, (evaluation_id, _, _, _) in enumerate(evaluations)}
+        nb_colonnes = len(evaluations)
+        valeurs = [None] * (len(etudiants) * nb_colonnes)
+
+        for etudiant_id, evaluation_id, valeur in notes.values_list('etudiant_id', 'evaluation_id', 'valeur'):
+            if etudiant_id in ligne:
+                valeurs[ligne[etudiant_id] * nb_colonnes + colonne[evaluation_id]] = valeur
+
+        return Response({
+            "matiere": matiere.id,
+            "semestre": int(semestre) if semestre else None,
+            "etudiants": {
+                "ids": [e[0] for e in etudiants],
+                "noms": [f"{e[1]} {e[2]}" for e in etudiants],
+            },
+            "evaluations": {
+                "ids": [e[0] for e in evaluations],
+                "noms": [e[1] for e in evaluations],
+                "semestres": [e[2] for e in evaluations],
+                "types": [e[3] for e in evaluations],
+            },
+            "valeurs": valeurs,
+        })
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def matieres_professeur(request):
@@ -1228,50 +1382,44 @@ def ajouter_paiement(request):
     except User.DoesNotExist:
         return Response({"error": "Étudiant introuvable"}, status=400)
 
-    now = datetime.now()
-    annee_scolaire = f"{now.year}-{now.year + 1}"
+    annee_scolaire = annee_scolaire_courante()
+    mois_list = list(dict.fromkeys(mois_list))
+    montant_par_mois = float(montant_total) / len(mois_list)
 
-    frais_crees = []
-    mois_existants = []
-
-    for mois in mois_list:
-        frais_existant = FraisMensuel.objects.filter(
-            etudiant=etudiant,
-            mois=mois,
-            annee_scolaire=annee_scolaire
-        ).first()
-
-        if frais_existant:
-            mois_existants.append(mois)
-        else:
-            montant_par_mois = float(montant_total) / len(mois_list)
-            
-            frais = FraisMensuel.objects.create(
+    # Tout ou rien : c'est la contrainte unique qui refuse un mois déjà présent
+    try:
+        with transaction.atomic():
+            frais_crees = FraisMensuel.objects.bulk_create([
+                FraisMensuel(
+                    etudiant=etudiant,
+                    mois=mois,
+                    montant=montant_par_mois,
+                    est_paye=True,
+                    annee_scolaire=annee_scolaire
+                )
+                for mois in mois_list
+            ])
+            paiement = Paiement.objects.create(
                 etudiant=etudiant,
-                mois=mois,
-                montant=montant_par_mois,
-                est_paye=True,
-                annee_scolaire=annee_scolaire
+                montant_total=montant_total,
+                statut="Payé",
+                mode_paiement="Liquide"
             )
-            frais_crees.append(frais)
-
-    if mois_existants:
+            Paiement.frais_mensuels.through.objects.bulk_create([
+                Paiement.frais_mensuels.through(paiement_id=paiement.id, fraismensuel_id=frais.id)
+                for frais in frais_crees
+            ])
+    except IntegrityError:
+        mois_existants = FraisMensuel.objects.filter(
+            etudiant=etudiant, mois__in=mois_list, annee_scolaire=annee_scolaire
+        ).values_list('mois', flat=True)
         return Response({
             "error": f"Des frais existent déjà pour les mois suivants: {', '.join(mois_existants)}"
         }, status=400)
 
-    if frais_crees:
-        paiement = Paiement.objects.create(
-            etudiant=etudiant,
-            montant_total=montant_total,
-            statut="Payé",
-            mode_paiement="Liquide"
-        )
-        paiement.frais_mensuels.set(frais_crees)
-
     return Response({
         "message": f"Paiement manuel ajouté avec succès pour {len(frais_crees)} mois",
-        "paiement_id": paiement.id if frais_crees else None,
+        "paiement_id": paiement.id,
         "montant_total": montant_total,
         "mois_payes": [frais.mois for frais in frais_crees],
         "frais_crees": [{
@@ -1460,17 +1608,35 @@ class UpdatePhotoView(APIView):
 
         return Response({"detail": "Aucune photo fournie"}, status=400)@api_view(['GET'])
 
+# Colonnes de l'export des notes (chemin rapide par values(), sans serializer)
+COLONNES_EXPORT_NOTES = OrderedDict([
+    ('id', 'id'),
+    ('etudiant', 'etudiant_id'),
+    ('etudiant_nom', 'etudiant__nom'),
+    ('etudiant_prenom', 'etudiant__prenom'),
+    ('etudiant_annee', 'etudiant__annee'),
+    ('classe', 'etudiant__classe__niveau'),
+    ('evaluation', 'evaluation_id'),
+    ('evaluation_nom', 'evaluation__nom'),
+    ('matiere_nom', 'evaluation__matiere__nom'),
+    ('semestre', 'evaluation__semestre'),
+    ('valeur', 'valeur'),
+    ('remarque', 'remarque'),
+])
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdmin])
 def admin_notes_etudiants(request):
+    """
+    Notes filtrées (classe, matiere, annee), paginées par curseur sur
+    (etudiant, evaluation, id) : ?cursor=...&page_size=...
+    Avec ?export=csv ou ?export=ndjson, tout est streamé en mémoire constante.
+    """
     classe_id = request.GET.get("classe")
     matiere_id = request.GET.get("matiere")
     annee = request.GET.get("annee")
 
-    notes = Note.objects.select_related(
-        "etudiant__classe",
-        "evaluation__matiere"
-    )
+    notes = Note.objects.all()
 
     if classe_id:
         notes = notes.filter(etudiant__classe_id=classe_id)
@@ -1481,8 +1647,40 @@ def admin_notes_etudiants(request):
     if annee:
         notes = notes.filter(etudiant__annee=annee)
 
-    serializer = NoteAdminSerializer(notes, many=True)
-    return Response(serializer.data)
+    notes = notes.order_by('etudiant_id', 'evaluation_id', 'id')
+
+    export = request.GET.get("export")
+    if export:
+        if export not in ("csv", "ndjson"):
+            return Response({"error": "export doit valoir 'csv' ou 'ndjson'"}, status=400)
+        lignes = notes.values_list(*COLONNES_EXPORT_NOTES.values()).iterator(chunk_size=TAILLE_LOT_EXPORT)
+        return reponse_export(export, "notes", list(COLONNES_EXPORT_NOTES.keys()), lignes)
+
+    try:
+        page_size = min(int(request.GET.get("page_size", NOTES_PAGE_SIZE)), NOTES_PAGE_SIZE_MAX)
+        if page_size < 1:
+            raise ValueError("page_size invalide")
+        position = decoder_curseur(request.GET.get("cursor"), 3)
+    except ValueError:
+        return Response({"error": "cursor ou page_size invalide"}, status=400)
+
+    if position:
+        etudiant_id, evaluation_id, note_id = position
+        notes = notes.filter(
+            models.Q(etudiant_id__gt=etudiant_id)
+            | models.Q(etudiant_id=etudiant_id, evaluation_id__gt=evaluation_id)
+            | models.Q(etudiant_id=etudiant_id, evaluation_id=evaluation_id, id__gt=note_id)
+        )
+
+    page = list(notes.select_related("etudiant__classe", "evaluation__matiere")[:page_size + 1])
+    suivant = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        dernier = page[-1]
+        suivant = url_curseur(request, (dernier.etudiant_id, dernier.evaluation_id, dernier.id))
+
+    serializer = NoteAdminSerializer(page, many=True)
+    return Response({"next": suivant, "results": serializer.data})
 
 class ProfesseursParClasseView(APIView):
     permission_classes = [IsAuthenticated]
@@ -1497,17 +1695,199 @@ class SalaireClasseMatiereViewSet(viewsets.ModelViewSet):
     serializer_class = SalaireClasseMatiereSerializer
     permission_classes = [IsAuthenticated, IsAdmin]  # Ajout de IsAdmin
 
+    def vue_plate(self):
+        return self.action in ('list', 'retrieve') and self.request.query_params.get('vue') == 'plate'
+
+    def get_serializer_class(self):
+        if self.vue_plate():
+            return SalaireClasseMatierePlatSerializer
+        return SalaireClasseMatiereSerializer
+
     def get_queryset(self):
         user = self.request.user
+        tarifs = SalaireClasseMatiere.objects.all()
         if user.role == 'prof':
-            return SalaireClasseMatiere.objects.filter(professeur=user)
-        return SalaireClasseMatiere.objects.all()
+            tarifs = tarifs.filter(professeur=user)
+
+        # Vue plate : uniquement les colonnes affichées
+        if self.vue_plate():
+            return tarifs.select_related('professeur', 'classe', 'matiere').only(
+                'id', 'montant', 'professeur__nom', 'professeur__prenom',
+                'classe__niveau', 'matiere__nom'
+            )
+        # Vue complète : le professeur, la classe et la matière imbriqués
+        # (avec l'unité, le professeur et la classe de la matière) en une jointure
+        return tarifs.select_related(
+            'professeur__classe', 'classe',
+            'matiere__unite', 'matiere__professeur', 'matiere__classe'
+        )
     
+# ---------------- Paie des professeurs ----------------
+def _params_paie(donnees, mois):
+    """(annee_scolaire, mois, professeur_id) ; ValidationError (400) si professeur n'est pas numérique."""
+    annee_scolaire = donnees.get('annee_scolaire') or annee_scolaire_courante()
+    if mois is not None and not isinstance(mois, list):
+        mois = [mois]
+    professeur = donnees.get('professeur')
+    professeur_id = _entier(professeur)
+    if professeur not in (None, "") and professeur_id is None:
+        raise ValidationError({"error": "professeur doit être un identifiant numérique"})
+    return annee_scolaire, mois or None, professeur_id
+
+class PaieView(APIView):
+    """
+    GET  : aperçu de la paie sans écriture (?annee_scolaire=&mois=Mars&mois=Avril&professeur=)
+    POST : recalcule et enregistre les salaires {annee_scolaire, mois: [...], professeur}
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        annee_scolaire, mois, professeur_id = _params_paie(request.query_params, request.query_params.getlist('mois'))
+        try:
+            lignes = calculer_paie(annee_scolaire, mois, professeur_id)
+        except MoisInvalide as e:
+            return Response({"error": str(e)}, status=400)
+
+        matieres = {
+            m_id: (nom, niveau)
+            for m_id, nom, niveau in Matiere.objects.filter(id__in={l["matiere_id"] for l in lignes})
+            .values_list('id', 'nom', 'classe__niveau')
+        }
+        profs = {
+            p_id: (nom, prenom)
+            for p_id, nom, prenom in User.objects.filter(id__in={l["professeur_id"] for l in lignes})
+            .values_list('id', 'nom', 'prenom')
+        }
+        for ligne in lignes:
+            ligne["matiere"], ligne["classe"] = matieres[ligne["matiere_id"]]
+            ligne["nom"], ligne["prenom"] = profs[ligne["professeur_id"]]
+
+        return Response({
+            "annee_scolaire": annee_scolaire,
+            "total": sum(ligne["montant"] for ligne in lignes),
+            "salaires": lignes
+        })
+
+    def post(self, request):
+        annee_scolaire, mois, professeur_id = _params_paie(request.data, request.data.get('mois'))
+        try:
+            ecrites, ignorees, supprimees = enregistrer_paie(annee_scolaire, mois, professeur_id)
+        except MoisInvalide as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({
+            "message": f"{ecrites} salaires calculés",
+            "ecrites": ecrites,
+            "ignorees_verrouillees": ignorees,
+            "supprimees": supprimees
+        })
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def verrouiller_paie_mois(request):
+    """Verrouille (ou déverrouille avec "verrouille": false) la paie d'un ou plusieurs mois."""
+    annee_scolaire, mois, _ = _params_paie(request.data, request.data.get('mois'))
+    if not mois:
+        return Response({"error": "Le mois est obligatoire"}, status=400)
+    try:
+        verrouille = BooleanField().to_internal_value(request.data.get('verrouille', True))
+    except ValidationError:
+        return Response({"error": "verrouille doit être un booléen"}, status=400)
+    lignes = verrouiller_paie(annee_scolaire, mois, verrouille)
+    return Response({"message": f"{lignes} salaires mis à jour", "lignes": lignes})
+
+class FichesPaieView(APIView):
+    """
+    Fiches de paie PDF d'un mois (?annee_scolaire=&mois=Mars&professeur=) dans une archive ZIP.
+    Rendu en tâche de fond (202), puis ?tache=<id> pour le suivre et télécharger l'archive.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        tache_id = request.query_params.get('tache')
+        if tache_id:
+            statut_tache, valeur = etat_tache(tache_id, 'zip')
+            if statut_tache == 'pret':
+                return FileResponse(open(valeur, 'rb'), as_attachment=True, filename="fiches_paie.zip")
+            if statut_tache == 'en_cours':
+                return Response({"tache": tache_id, "statut": "en_cours"}, status=202)
+            if statut_tache == 'erreur':
+                return Response({"tache": tache_id, "statut": "erreur", "error": valeur}, status=500)
+            return Response({"error": "Tâche introuvable"}, status=404)
+
+        annee_scolaire, _, professeur_id = _params_paie(request.query_params, None)
+        mois = request.query_params.get('mois')
+        if not mois:
+            return Response({"error": "Le mois est obligatoire"}, status=400)
+        try:
+            periode(mois, annee_scolaire)
+        except MoisInvalide as e:
+            return Response({"error": str(e)}, status=400)
+
+        salaires = SalaireMensuel.objects.filter(annee_scolaire=annee_scolaire, mois=mois)
+        if professeur_id:
+            salaires = salaires.filter(professeur_id=professeur_id)
+        if not salaires.exists():
+            return Response({"error": "Aucun salaire calculé pour ce mois"}, status=404)
+
+        tache_id = lancer_tache(
+            partial(ecrire_fiches_zip, annee_scolaire=annee_scolaire, mois=mois, professeur_id=professeur_id), 'zip'
+        )
+        return Response({
+            "tache": tache_id,
+            "statut": "en_cours",
+            "url": request.build_absolute_uri(f"{request.path}?tache={tache_id}")
+        }, status=202)
+
+class GainsProfesseurView(APIView):
+    """
+    Dû / payé / reste à payer par année scolaire et par mois.
+    Professeur : ses propres gains.
+    Admin : ?professeur=<id> pour le détail d'un professeur, sinon les totaux de
+    chaque professeur (?annee_scolaire= pour une seule année).
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrProf]
+
+    def get(self, request):
+        if request.user.role == 'prof':
+            return Response(gains([request.user.id])[request.user.id])
+
+        professeur = request.query_params.get('professeur')
+        if professeur:
+            professeur_id = _entier(professeur)
+            if professeur_id is None:
+                return Response({"error": "professeur doit être un identifiant numérique"}, status=400)
+            professeur = User.objects.filter(id=professeur_id, role='prof').values_list('id', flat=True).first()
+            if not professeur:
+                return Response({"error": "Professeur introuvable"}, status=404)
+            return Response(gains([professeur])[professeur])
+
+        annee_scolaire = request.query_params.get('annee_scolaire')
+        professeurs = list(User.objects.filter(role='prof').order_by('nom', 'prenom').values_list('id', 'nom', 'prenom'))
+        resumes = gains([p_id for p_id, _, _ in professeurs])
+
+        lignes = []
+        for p_id, nom, prenom in professeurs:
+            resume = resumes[p_id]
+            if annee_scolaire:
+                resume = next(
+                    (annee for annee in resume["annees"] if annee["annee_scolaire"] == annee_scolaire),
+                    {"du": 0, "paye": 0, "reste": 0}
+                )
+            lignes.append({
+                "professeur_id": p_id, "nom": nom, "prenom": prenom,
+                "du": resume["du"], "paye": resume["paye"], "reste": resume["reste"],
+            })
+        return Response({
+            "annee_scolaire": annee_scolaire,
+            "total": {cle: sum(ligne[cle] for ligne in lignes) for cle in ("du", "paye", "reste")},
+            "professeurs": lignes
+        })
+
 class PaiementProfListCreateView(APIView):
     permission_classes = [IsAuthenticated, IsAdmin]  # Ajout de IsAdmin
 
     def get(self, request):
-        paiements = PaiementProf.objects.all()
+        paiements = PaiementProf.objects.prefetch_related('frais_mensuels')
         serializer = PaiementProfSerializer(paiements, many=True)
         return Response(serializer.data)
 
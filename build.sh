@@ -4,4 +4,9 @@ pip install -r requirements.txt
 
 python manage.py collectstatic --noinput
 
-python manage.py migrate --noinput
\ No newline at end of file
+python manage.py migrate --noinput
+
+# Les webhooks Stripe sont seulement mis en boîte de réception par l'API :
+# un worker doit tourner à côté du service web pour les traiter (voir Procfile).
+# Sur Render : service « Background Worker » avec ce même build.sh et la commande
+#   python manage.py traiter_webhooks --continu
@@ -43,6 +43,53 @@ INSTALLED_APPS = [
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY")
 STRIPE_PUBLIC_KEY = os.environ.get("STRIPE_PUBLIC_KEY")
 STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+# Client HTTP Stripe : délais (s), réessais, disjoncteur ; STRIPE_API_BASE pointe vers `manage.py fake_stripe` en local
+STRIPE_TIMEOUT = float(os.environ.get("STRIPE_TIMEOUT", 10))
+STRIPE_MAX_RETRIES = int(os.environ.get("STRIPE_MAX_RETRIES", 1))
+STRIPE_API_BASE = os.environ.get("STRIPE_API_BASE")
+STRIPE_DISJONCTEUR_SEUIL = int(os.environ.get("STRIPE_DISJONCTEUR_SEUIL", 5))
+STRIPE_DISJONCTEUR_DELAI = float(os.environ.get("STRIPE_DISJONCTEUR_DELAI", 30))
+# Cache du statut des sessions Checkout (secondes) ; les sessions terminées restent en cache
+STRIPE_STATUT_TTL = int(os.environ.get("STRIPE_STATUT_TTL", 5))
+
+# Mois facturés aux étudiants pendant l'année scolaire (manage.py generer_frais)
+MOIS_SCOLAIRES = [
+    'Septembre', 'Octobre', 'Novembre', 'Décembre', 'Janvier',
+    'Février', 'Mars', 'Avril', 'Mai', 'Juin',
+]
+
+# Rendu des PDF (bulletins, fiches de paie) depuis le web et les tâches de fond :
+# chaque requête démarrerait son propre pool, on reste donc dans le processus par
+# défaut. Les commandes (generer_bulletins, fiches_paie) utilisent tous les CPU.
+BULLETINS_WORKERS = int(os.environ.get("BULLETINS_WORKERS", 1))
+BULLETINS_TAILLE_LOT = int(os.environ.get("BULLETINS_TAILLE_LOT", 20))
+
+# Fichiers produits par les tâches de fond (exports XLSX, archives), hors de MEDIA_ROOT
+TACHES_DIR = os.environ.get("TACHES_DIR", os.path.join(BASE_DIR, 'cache', 'taches'))
+
+# Cache partagé entre les workers et les commandes (verrous Stripe, quotas DRF,
+# tableaux de bord, gains) : Redis si CACHE_REDIS_URL est défini (paquet redis),
+# sinon une table de la base créée par la migration 0013 (createcachetable).
+# Disque pour les PDF.
+if os.environ.get("CACHE_REDIS_URL"):
+    CACHE_DEFAUT = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ["CACHE_REDIS_URL"],
+    }
+else:
+    CACHE_DEFAUT = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_inata',
+    }
+
+CACHES = {
+    'default': CACHE_DEFAUT,
+    'bulletins': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get("BULLETINS_CACHE_DIR", os.path.join(BASE_DIR, 'cache', 'bulletins')),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
 
 # Media files
 MEDIA_URL = '/media/'
@@ -179,6 +226,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Plafonds par utilisateur des vues qui appellent Stripe (voir api/throttles.py)
+    'DEFAULT_THROTTLE_RATES': {
+        'verification_paiement': os.environ.get("THROTTLE_VERIFICATION_PAIEMENT", "30/min"),
+        'session_stripe': os.environ.get("THROTTLE_SESSION_STRIPE", "10/min"),
+    },
 }
 
 SIMPLE_JWT = {